@@ -1,20 +1,142 @@
+import json
+import random
+from typing import Dict, Optional, Union, Iterable, Iterator, Any
+
+from config import API_RETRY_BACKOFF_SECONDS
+
+JSON_WHITESPACE = " \t\n\r"
+
+
 class Pagination(object):
-    def __init__(self, first_uri: str, next_uri: str = None, result: [] = None):
+    # uri is the path relative to the api base url, e.g. "/peers"
+    def __init__(
+            self,
+            uri: str,
+            limit: int,
+            result: [] = None,
+            order_by: Optional[str] = None,
+            params: Optional[Dict[str, Union[int, str]]] = None
+    ):
         if result is None:
             result = []
-        self.first_uri = first_uri
-        self.next_uri = next_uri
+        if params is None:
+            params = {}
+        self.uri = uri
+        self.limit = limit
+        self.order_by = order_by
+        self.params = params
+        self.page_count: Optional[int] = None
+        self.complete = False
         self.result = result
 
-    def to_next(self, next_uri: str, result: []):
-        return Pagination(self.first_uri, next_uri, self.to_result(result))
-
     def to_result(self, result: []):
         self.result.extend(result)
         return self.result
 
-    def get_uri(self, *args):
-        if self.next_uri is None:
-            return self.first_uri.format(*args)
+    def get_params(self, page: int) -> Dict[str, Union[int, str]]:
+        params: Dict[str, Union[int, str]] = {**self.params, "page": page, "limit": self.limit}
+        if self.order_by is not None:
+            params["orderBy"] = self.order_by
+        return params
+
+    def get_backoff_seconds(self, attempt: int) -> float:
+        # exponential backoff with full jitter
+        return random.uniform(0, API_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+    def set_page_count(self, meta: Dict):
+        if "pageCount" in meta:
+            self.page_count = int(meta["pageCount"])
         else:
-            return self.next_uri
+            self.page_count = -(-int(meta["totalCount"]) // self.limit)
+
+
+class CachedPage(object):
+    # a page of an earlier run, its etag and body digest tell whether the page changed since
+    __slots__ = ("etag", "digest", "meta", "entries")
+
+    def __init__(self, etag: Optional[str], digest: str, meta: Dict, entries: Any):
+        self.etag: Optional[str] = etag
+        self.digest: str = digest
+        self.meta: Dict = meta
+        self.entries: Any = entries
+
+
+class PageStream(object):
+    # incrementally decodes a {"meta": {...}, "data": [...]} response body, yielding the data entries one at a time
+    # the other top level fields, e.g. meta, are available in fields once iteration is done
+    def __init__(self, chunks: Iterable[str]):
+        self.chunks = iter(chunks)
+        self.buffer = ""
+        self.position = 0
+        self.exhausted = False
+        self.fields: Dict[str, Any] = {}
+        self.decoder = json.JSONDecoder()
+
+    def __iter__(self) -> Iterator[Any]:
+        self.expect("{")
+        if self.peek() == "}":
+            return
+        while True:
+            key = self.read_value()
+            self.expect(":")
+            if key == "data":
+                yield from self.read_array()
+            else:
+                self.fields[key] = self.read_value()
+            if self.next_char() == "}":
+                return
+
+    def read_array(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self.read_value()
+            if self.next_char() == "]":
+                return
+
+    def fill(self) -> bool:
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.exhausted = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in JSON_WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                raise ValueError("unexpected end of json stream")
+
+    def next_char(self) -> str:
+        char = self.peek()
+        self.position += 1
+        if char not in ",]}":
+            raise ValueError(f"unexpected '{char}' in json stream")
+        return char
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"expected '{char}' in json stream")
+        self.position += 1
+
+    def read_value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.exhausted and self.fill():
+                continue
+            self.position = end
+            return value
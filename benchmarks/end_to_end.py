@@ -0,0 +1,80 @@
+# Runs messenger.py end to end against a local stub node with a synthetic electorate, in test and send mode.
+# Run from the repository root: python3 -m benchmarks.end_to_end [voter count ...] [--latency <ms>]
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, SUPPRESS
+
+from benchmarks.stub_node import StubNode
+from benchmarks.synthetic import make_voter_entries, make_valid_address
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USERNAME = "bench"
+MNEMONIC = "benchmark mnemonic"
+MODES = {"test": ["-t"], "send": []}
+
+parser = ArgumentParser(description="Run messenger.py end to end against a local stub node")
+parser.add_argument("counts", type=int, nargs="*", default=[1_000, 10_000, 100_000], help="Voter counts")
+parser.add_argument("--latency", type=float, default=5, help="Latency in ms added to every api request")
+parser.add_argument("--child", nargs=2, metavar=("BASE_URL", "MODE"), help=SUPPRESS)
+
+
+def run_child(base_url: str, mode: str):
+    # runs in a fresh process and directory, config.py is adjusted before the messenger reads it
+    import config
+    config.API_BASE_URL = base_url
+    config.API_BASE_URLS = [base_url]
+    config.PRODUCERS = [{"username": USERNAME, "wallet_mnemonic": MNEMONIC, "message": "benchmark"}]
+    config.METRICS_LOG_FILE = "logs/metrics.log"
+    sys.argv = ["messenger.py"] + MODES[mode]
+    start = time.perf_counter()
+    import messenger
+    messenger.main()
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in KiB on linux
+    print(json.dumps({"seconds": seconds, "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}))
+
+
+def run_scenario(node: StubNode, mode: str) -> (dict, dict):
+    with tempfile.TemporaryDirectory() as cwd:
+        os.mkdir(os.path.join(cwd, "logs"))
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.end_to_end", "--child", node.base_url, mode],
+            cwd=cwd, env={**os.environ, "PYTHONPATH": ROOT}, check=True, capture_output=True, text=True
+        )
+        with open(os.path.join(cwd, "logs", "metrics.log")) as infile:
+            metrics = json.loads(infile.readlines()[-1])
+    return json.loads(completed.stdout.splitlines()[-1]), metrics
+
+
+def main():
+    args = parser.parse_args()
+    if args.child is not None:
+        run_child(*args.child)
+        return
+    for count in args.counts:
+        voters = make_voter_entries(count, USERNAME, address_maker=make_valid_address)
+        node = StubNode(USERNAME, voters, args.latency / 1000)
+        node.start()
+        try:
+            for mode in MODES:
+                requests_before, transactions_before = node.request_count, node.transaction_count
+                result, metrics = run_scenario(node, mode)
+                phases = sorted(metrics["phases"].items(), key=lambda item: item[1]["seconds"], reverse=True)
+                print(
+                    f"{count:>7} voters {mode:<4}  wall {result['seconds']:7.3f}s  "
+                    f"{count / result['seconds']:9.0f} voters/s  peak rss {result['max_rss'] / 2 ** 20:6.1f} MiB  "
+                    f"{node.request_count - requests_before:>5} requests  "
+                    f"{node.transaction_count - transactions_before:>5} transactions"
+                )
+                print("    " + "  ".join(f"{phase} {stats['seconds']:.3f}s" for phase, stats in phases[:6]))
+        finally:
+            node.stop()
+
+
+if __name__ == "__main__":
+    main()
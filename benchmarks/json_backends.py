@@ -0,0 +1,57 @@
+# Compares the installed json backends on voter pages and on the activations map of data.json.
+# Run from the repository root: python3 -m benchmarks.json_backends [voter count]
+import sys
+import time
+from typing import Callable
+
+from api import PageStream
+from benchmarks.synthetic import make_voter_entries, make_address
+from serialization import backends, JsonBackend
+
+PAGE_LIMIT = 100
+ROUNDS = 3
+
+
+def timed(action: Callable[[], object]) -> float:
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def decode_pages(backend: JsonBackend, pages: [bytes]):
+    for page in pages:
+        backend.loads(page)
+
+
+def stream_pages(pages: [bytes]):
+    for page in pages:
+        for _ in PageStream([page.decode()]):
+            pass
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    entries = make_voter_entries(count, "bench")
+    pages = []
+    for offset in range(0, count, PAGE_LIMIT):
+        page = {"meta": {"count": PAGE_LIMIT, "pageCount": -(-count // PAGE_LIMIT)}, "data": entries[offset:offset + PAGE_LIMIT]}
+        pages.append(backends["json"].dumps(page).encode())
+    activations = {make_address(index): index % 5 + 1 for index in range(count)}
+    data = {"last_activation_timestamp": int(time.time()), "activations": activations}
+    data_text = backends["json"].dumps(data)
+    print(f"{len(pages)} pages ({sum(map(len, pages)) / 2 ** 20:.1f} MiB), {count} activations")
+    for name, backend in backends.items():
+        print(
+            f"{name:<8} pages {timed(lambda: decode_pages(backend, pages)):7.3f}s  "
+            f"activations load {timed(lambda: backend.loads(data_text)):7.3f}s  "
+            f"dump {timed(lambda: backend.dumps(data, vars)):7.3f}s"
+        )
+    print(f"{'stream':<8} pages {timed(lambda: stream_pages(pages)):7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Compares the per voter selection loop to the columnar selection engine.
+# Run from the repository root: python3 -m benchmarks.selection [voter count ...]
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.synthetic import make_address
+from config import ATOMIC
+from selection import columns_from_index, select_over_cap, select_voters_to_message
+
+VOTE_CAP = 12_345 * ATOMIC
+MESSAGE_LIMIT = 3
+EXCLUDED_COUNT = 50
+
+
+def legacy_select(
+        voters: List[Tuple[str, int]],
+        activations: Dict[str, int],
+        exclude_voters: List[str],
+        is_active: bool,
+        is_new_active: bool
+) -> List[str]:
+    # the loop of the previous messenger.get_voters_over_cap and get_voters_to_message
+    voters_to_message = []
+    for address, votes in voters:
+        if votes <= VOTE_CAP or address in exclude_voters:
+            continue
+        if address in activations:
+            activation_count = activations[address]
+            if is_active and activation_count < MESSAGE_LIMIT:
+                activations[address] = activation_count + 1
+                voters_to_message.append(address)
+        elif is_active or is_new_active:
+            activations[address] = 1
+            voters_to_message.append(address)
+    return voters_to_message
+
+
+def make_electorate(count: int) -> (Dict[str, int], Dict[str, int], List[str]):
+    rnd = random.Random(count)
+    voter_index = {make_address(index): rnd.randint(1, 50_000) * ATOMIC for index in range(count)}
+    activations = {address: rnd.randint(1, MESSAGE_LIMIT) for address in voter_index if rnd.random() < 0.5}
+    exclude_voters = rnd.sample(list(voter_index), min(EXCLUDED_COUNT, count))
+    return voter_index, activations, exclude_voters
+
+
+def main():
+    counts = [int(count) for count in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for count in counts:
+        voter_index, activations, exclude_voters = make_electorate(count)
+        for is_active, is_new_active in [(True, False), (False, True)]:
+            legacy_activations = dict(activations)
+            start = time.perf_counter()
+            legacy_selected = legacy_select(
+                list(voter_index.items()), legacy_activations, exclude_voters, is_active, is_new_active
+            )
+            legacy_seconds = time.perf_counter() - start
+
+            engine_activations = dict(activations)
+            start = time.perf_counter()
+            selected = select_voters_to_message(
+                select_over_cap(columns_from_index(voter_index), VOTE_CAP),
+                engine_activations,
+                set(exclude_voters),
+                is_active,
+                is_new_active,
+                MESSAGE_LIMIT
+            )
+            engine_seconds = time.perf_counter() - start
+
+            if selected.addresses != legacy_selected or engine_activations != legacy_activations:
+                raise Exception(f"Selection of {count} voters differs from the per voter loop")
+            mode = "active" if is_active else "new active"
+            print(
+                f"{count:>9} voters {mode:<10}  loop {legacy_seconds:7.3f}s  columns {engine_seconds:7.3f}s  "
+                f"speedup {legacy_seconds / engine_seconds:5.1f}x  ({len(selected)} selected)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# Compares serial and process pool signing of transfer transactions.
+# Run from the repository root: python3 -m benchmarks.signing [worker count]
+import os
+import sys
+import time
+
+from solar_crypto.identity.address import address_from_passphrase
+
+from transaction import Payment, PreparedTransfer, sign_prepared_transfers, ensure_network
+
+PAYMENTS_PER_TRANSACTION = 40
+MNEMONIC = "benchmark mnemonic"
+SECOND_MNEMONIC = "benchmark second mnemonic"
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    # recipient addresses get the version of the configured network
+    ensure_network()
+    payments = [Payment(address_from_passphrase(f"voter {index}"), 1) for index in range(PAYMENTS_PER_TRANSACTION)]
+    for count in [1, 10, 100]:
+        prepared_transfers = [PreparedTransfer(payments, "benchmark", 1_000_000, nonce) for nonce in range(1, count + 1)]
+        timings = []
+        for worker_count in [1, workers]:
+            start = time.perf_counter()
+            transactions = sign_prepared_transfers(prepared_transfers, MNEMONIC, SECOND_MNEMONIC, worker_count)
+            timings.append(time.perf_counter() - start)
+            assert [int(tx["nonce"]) for tx in transactions] == list(range(1, count + 1))
+        print(f"{count:>3} transaction(s)  serial {timings[0]:7.3f}s  {workers} workers {timings[1]:7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
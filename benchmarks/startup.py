@@ -0,0 +1,63 @@
+# Measures cold start time of the messenger for runs that exit early and the imports of the send path.
+# Run from the repository root: python3 -m benchmarks.startup [rounds]
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from config import MESSAGE_INTERVAL_SECONDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSENGER = os.path.join(ROOT, "messenger.py")
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| (\S+)$")
+
+
+def run(arguments: [str], cwd: str) -> (float, int, [str]):
+    # returns the wall time, the cumulative import time in microseconds and the slowest top level imports
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", *arguments], cwd=cwd, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise Exception(process.stderr)
+    top_level = []
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match is not None:
+            top_level.append((int(match.group(1)), match.group(2)))
+    slowest = [f"{name} {micros / 1000:.0f}ms" for micros, name in sorted(top_level, reverse=True)[:3]]
+    return elapsed, sum(micros for micros, _ in top_level), slowest
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as cwd:
+        os.mkdir(os.path.join(cwd, "logs"))
+        # an activation shortly ahead makes a run exit right after the schedule check
+        last_activation = int(time.time()) - MESSAGE_INTERVAL_SECONDS + 60 * 60
+        subprocess.run(
+            [
+                sys.executable, "-c",
+                "import data, producers\n"
+                "for producer in producers.producers:\n"
+                f"    data.set_last_activation_timestamp(producer.username, {last_activation})"
+            ],
+            cwd=cwd, env={**os.environ, "PYTHONPATH": ROOT}, check=True
+        )
+        paths = {
+            "no-op": [MESSENGER, "-t"],
+            "schedule change": [MESSENGER, "-t", "-st", "13:00"],
+            "send imports": ["-c", "import messenger, transaction, core_api; core_api.build_session()"],
+        }
+        for name, arguments in paths.items():
+            results = [run(arguments, cwd) for _ in range(rounds)]
+            elapsed, import_micros, slowest = min(results)
+            print(f"{name:<16} wall {elapsed:6.3f}s  imports {import_micros / 1000:6.0f}ms  slowest: {', '.join(slowest)}")
+
+
+if __name__ == "__main__":
+    main()
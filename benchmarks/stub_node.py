@@ -0,0 +1,190 @@
+# A local stand in for a Solar node api, serving a synthetic electorate with an injected latency.
+import copy
+import hashlib
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse, parse_qs
+
+from config import ATOMIC
+
+HEIGHT = 1_000_000
+PEER_COUNT = 30
+SENDER_BALANCE = 1_000_000_000 * ATOMIC
+NODE_CONFIGURATION = {
+    "constants": {"transfer": {"maximum": 40}},
+    "pool": {"dynamicFees": {"addonBytes": {"transfer": 100}, "minFeePool": 3000}},
+}
+
+
+class StubNode(object):
+    # sorting is "supported" for an api that applies orderBy, "ignored" for one that returns voters unsorted
+    # and "rejected" for one that answers orderBy with an error
+    def __init__(self, username: str, voters: List[Dict], latency_seconds: float, sorting: str = "supported"):
+        self.username: str = username
+        self.voters: List[Dict] = voters
+        self.sorted_voters: Dict[str, List[Dict]] = {
+            f"votingFor.{username}.votes:desc": sorted(
+                voters, key=lambda voter: int(voter["votingFor"][username]["votes"]), reverse=True
+            ),
+            "balance:desc": sorted(voters, key=lambda voter: int(voter["balance"]), reverse=True),
+        }
+        self.latency_seconds: float = latency_seconds
+        self.configuration: Dict = copy.deepcopy(NODE_CONFIGURATION)
+        self.sorting: str = sorting
+        # the query of every voters request, e.g. to count the pages a scan read
+        self.voter_requests: List[Dict[str, str]] = []
+        # chain activity served by /transactions, e.g. votes and transfers that change the voter index
+        self.transactions: List[Dict] = []
+        self.request_count: int = 0
+        self.status_count: int = 0
+        self.transaction_count: int = 0
+        self.broadcast_count: int = 0
+        # every request is answered with a server error, e.g. for a node that is restarting
+        self.failing: bool = False
+        # voter pages carry an etag and are answered with 304 when the request names the current one
+        self.etags: bool = False
+        # voter pages answered with a server error this many more times, e.g. for a page that recovers on a retry
+        self.page_failures: Dict[int, int] = {}
+        # balances of sender wallets by address, other sender wallets have SENDER_BALANCE
+        self.balances: Dict[str, int] = {}
+        # transactions of these sender public keys are rejected as invalid, e.g. for a wallet with a stuck nonce
+        self.rejected_senders: Set[str] = set()
+        # broadcasts after this many are answered with a server error
+        self.broadcast_limit: Optional[int] = None
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/api"
+
+    def start(self):
+        node = self
+
+        class Handler(StubNodeHandler):
+            stub_node = node
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def paginate(path: str, query: Dict[str, str], items: List[Dict]) -> Dict:
+    page = int(query.get("page", 1))
+    limit = int(query.get("limit", 100))
+    page_count = max(1, -(-len(items) // limit))
+    data = items[(page - 1) * limit:page * limit]
+    return {
+        "meta": {
+            "count": len(data),
+            "pageCount": page_count,
+            "totalCount": len(items),
+            "next": None if page >= page_count else f"{path}?page={page + 1}&limit={limit}",
+        },
+        "data": data,
+    }
+
+
+class StubNodeHandler(BaseHTTPRequestHandler):
+    stub_node: StubNode = None
+
+    def log_message(self, format_string, *args):
+        pass
+
+    def send_json(self, value, status: int = 200, with_etag: bool = False):
+        body = json.dumps(value).encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"' if with_etag else None
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        node = self.stub_node
+        node.request_count += 1
+        time.sleep(node.latency_seconds)
+        if node.failing:
+            self.send_json({"error": "Service Unavailable"}, 503)
+            return
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path.removeprefix("/api")
+        if path == "/node/status":
+            node.status_count += 1
+            self.send_json({"data": {"synced": True, "now": HEIGHT, "blocksCount": 0, "timestamp": 0}})
+        elif path == "/node/configuration":
+            self.send_json({"data": node.configuration})
+        elif path == "/peers":
+            peers = [
+                {"ip": f"10.0.0.{index}", "port": 6001, "version": "4.0.0", "height": HEIGHT, "latency": 10}
+                for index in range(PEER_COUNT)
+            ]
+            self.send_json(paginate(path, query, peers))
+        elif path == f"/delegates/{node.username}/voters":
+            node.voter_requests.append(query)
+            page = int(query.get("page", 1))
+            if node.page_failures.get(page, 0) > 0:
+                node.page_failures[page] -= 1
+                self.send_json({"error": "Service Unavailable"}, 503)
+            elif "orderBy" not in query or node.sorting == "ignored":
+                self.send_json(paginate(path, query, node.voters), with_etag=node.etags)
+            elif node.sorting == "supported" and query["orderBy"] in node.sorted_voters:
+                self.send_json(paginate(path, query, node.sorted_voters[query["orderBy"]]), with_etag=node.etags)
+            else:
+                self.send_json({"error": "Unprocessable Entity"}, 422)
+        elif path == "/transactions":
+            self.send_json(paginate(path, query, node.transactions))
+        elif path.startswith("/wallets/"):
+            address = path.split("/")[-1]
+            voter = next((voter for voter in node.voters if voter["address"] == address), None)
+            if voter is not None:
+                self.send_json({"data": voter})
+            else:
+                balance = node.balances.get(address, SENDER_BALANCE)
+                self.send_json({"data": {"address": address, "nonce": "0", "balance": str(balance), "votingFor": {}}})
+        else:
+            self.send_json({"error": "Not Found"}, 404)
+
+    def do_POST(self):
+        node = self.stub_node
+        node.request_count += 1
+        time.sleep(node.latency_seconds)
+        if node.failing:
+            self.send_json({"error": "Service Unavailable"}, 503)
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        node.broadcast_count += 1
+        if node.broadcast_limit is not None and node.broadcast_count > node.broadcast_limit:
+            self.send_json({"error": "Service Unavailable"}, 503)
+            return
+        transaction_ids = [
+            transaction["id"] for transaction in body["transactions"]
+            if transaction.get("senderPublicKey") not in node.rejected_senders
+        ]
+        invalid_ids = [
+            transaction["id"] for transaction in body["transactions"]
+            if transaction.get("senderPublicKey") in node.rejected_senders
+        ]
+        node.transaction_count += len(transaction_ids)
+        self.send_json({
+            "data": {"accept": transaction_ids, "broadcast": transaction_ids, "excess": [], "invalid": invalid_ids},
+            "errors": {
+                transaction_id: {"type": "ERR_APPLY", "message": "Cannot apply a transaction with nonce"}
+                for transaction_id in invalid_ids
+            }
+        })
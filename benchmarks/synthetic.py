@@ -0,0 +1,46 @@
+import hashlib
+import random
+from typing import Dict, List, Callable
+
+import base58
+
+from config import ATOMIC, TRANSACTION_NETWORK
+
+
+def make_address(index: int) -> str:
+    return f"S{index:033d}"
+
+
+def make_valid_address(index: int) -> str:
+    # passes address validation, needed when transactions to synthetic voters are signed
+    public_key_hash = hashlib.sha256(index.to_bytes(8, "big")).digest()[:20]
+    return base58.b58encode_check(bytes([TRANSACTION_NETWORK["version"]]) + public_key_hash).decode()
+
+
+def make_voter_entry(rnd: random.Random, index: int, username: str, address: str) -> Dict:
+    balance = rnd.randint(1, 50_000) * ATOMIC
+    voting_for = {username: {"percent": 100.0, "votes": str(balance)}}
+    if rnd.random() < 0.1:
+        # a share of voters splits its vote over a second block producer
+        voting_for = {
+            username: {"percent": 50.0, "votes": str(balance // 2)},
+            "other": {"percent": 50.0, "votes": str(balance - balance // 2)},
+        }
+    return {
+        "address": address,
+        "publicKey": f"02{index:064x}",
+        "balance": str(balance),
+        "nonce": str(rnd.randint(0, 100)),
+        "attributes": {"votes": {k: v["percent"] for k, v in voting_for.items()}},
+        "votingFor": voting_for,
+    }
+
+
+def make_voter_entries(
+        count: int,
+        username: str,
+        seed: int = 1,
+        address_maker: Callable[[int], str] = make_address
+) -> List[Dict]:
+    rnd = random.Random(seed)
+    return [make_voter_entry(rnd, index, username, address_maker(index)) for index in range(count)]
@@ -0,0 +1,80 @@
+# Compares the lazily parsed, slotted Wallet to the previous eagerly parsed classes.
+# Run from the repository root: python3 -m benchmarks.wallet [voter count]
+import json
+import sys
+import time
+import tracemalloc
+from typing import Optional, Callable
+
+from benchmarks.synthetic import make_voter_entries
+from core_api import parse_wallets
+
+USERNAME = "bench"
+
+
+class LegacyVotingFor(object):
+    def __init__(self, username: str, percent: float, votes: int):
+        self.username: str = username
+        self.percent: float = percent
+        self.votes: int = votes
+
+
+class LegacyWallet(object):
+    def __init__(self, address: str, public_key: str, username: Optional[str], balance: int, nonce: int,
+                 voting_for: [LegacyVotingFor]):
+        self.address: str = address
+        self.public_key: str = public_key
+        self.username: Optional[str] = username
+        self.balance: int = balance
+        self.nonce: int = nonce
+        self.voting_for: [LegacyVotingFor] = voting_for
+
+
+def parse_legacy_wallets(data) -> [LegacyWallet]:
+    wallets = []
+    for entry in data:
+        attributes = entry["attributes"] if "attributes" in entry else {}
+        wallets.append(LegacyWallet(
+            address=entry["address"],
+            public_key=entry["publicKey"] if "publicKey" in entry else None,
+            username=attributes["delegate"]["username"] if "delegate" in attributes else None,
+            balance=int(entry["balance"]),
+            nonce=int(entry["nonce"]),
+            voting_for=[
+                LegacyVotingFor(username, vf["percent"], int(vf["votes"])) for username, vf in entry["votingFor"].items()
+            ]
+        ))
+    return wallets
+
+
+def legacy_votes(wallet: LegacyWallet) -> int:
+    return next((vf.votes for vf in wallet.voting_for if vf.username == USERNAME), 0)
+
+
+def run(name: str, payload: str, parse: Callable[[list], list], votes: Callable[[object], int]):
+    # the decoded payload is released after parsing, retained memory is what the wallet records keep alive
+    tracemalloc.start()
+    data = json.loads(payload)
+    start = time.perf_counter()
+    wallets = parse(data)
+    parsed = time.perf_counter()
+    del data
+    total = sum(votes(wallet) for wallet in wallets) + sum(votes(wallet) for wallet in wallets)
+    done = time.perf_counter()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<8} parse {parsed - start:7.3f}s  lookup x2 {done - parsed:7.3f}s  "
+        f"retained {retained / 2 ** 20:8.1f} MiB  peak {peak / 2 ** 20:8.1f} MiB  ({len(wallets)} wallets, {total})"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    payload = json.dumps(make_voter_entries(count, USERNAME))
+    run("legacy", payload, parse_legacy_wallets, legacy_votes)
+    run("wallet", payload, lambda data: parse_wallets(data, USERNAME), lambda wallet: wallet.votes)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,35 @@
 ATOMIC = 100_000_000
 
 API_BASE_URL = "http://localhost:6003/api"
+API_BASE_URLS = [API_BASE_URL]
+API_HEDGE_AFTER_SECONDS = None
+API_ENDPOINT_COOLDOWN_SECONDS = 30
+API_BROADCAST_ENDPOINTS = 2
+API_TIMEOUT_SECONDS = 10
+API_RETRIES = 3
+API_RETRY_BACKOFF_SECONDS = 0.5
+API_PAGE_LIMIT = 100
+API_MAX_WORKERS = 4
+API_STREAM_CHUNK_SIZE = 64 * 1024
+# only used with INCREMENTAL_SYNC_ENABLED = False, a full sync of the voter index reads every voter
+API_SORTED_SCAN_ENABLED = True
+
+TRANSFER_MAX_RECIPIENTS = None
+TRANSFER_RETRIES = 1
+BROADCAST_MAX_TRANSACTIONS = 40
+SIGNING_WORKERS = 1
+NODE_CONFIGURATION_CACHE_SECONDS = 6 * 60 * 60
+
+JSON_BACKEND = "auto"
+
+INCREMENTAL_SYNC_ENABLED = True
+INCREMENTAL_SYNC_MAX_BLOCKS = 900
+VOTER_SNAPSHOT_ENABLED = True
 
 SYNC_CHECK_ENABLED = True
 SYNC_CHECK_BLOCK_THRESHOLD = 2
+SYNC_CHECK_PEERS_QUORUM = 10
+SYNC_CHECK_CACHE_SECONDS = 60
 
 TRANSACTION_NETWORK = {
     "epoch": "2022,3,28,18,00,00",
@@ -14,8 +40,21 @@ TRANSACTION_NETWORK = {
 BLOCK_PRODUCER_USERNAME = ""
 WALLET_MNEMONIC = ""
 WALLET_SECOND_MNEMONIC = None
+# more wallets to spread the messages over, e.g. [{"mnemonic": "...", "second_mnemonic": None}]
+SENDER_WALLETS = []
 VOTE_CAP = int(12_345 * ATOMIC)
 MESSAGE = ""
 MESSAGE_INTERVAL_SECONDS = 7 * 24 * 60 * 60
 MESSAGE_LIMIT_PER_VOTER = -1
+VOTER_SCHEDULE_ENABLED = False
+ACTIVATION_ARCHIVE_SECONDS = 180 * 24 * 60 * 60
 EXCLUDE_VOTERS = []
+# one entry per block producer served by this script, left out values default to the values above
+PRODUCERS = [
+    {"username": BLOCK_PRODUCER_USERNAME}
+]
+
+DAEMON_POLL_INTERVAL_SECONDS = 60
+
+METRICS_LOG_FILE = None
+METRICS_PROMETHEUS_FILE = None
@@ -1,9 +1,19 @@
-from typing import Optional
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, Callable, Dict, List, Any, Tuple, Iterator, TypeVar, TYPE_CHECKING
 
-import requests
+if TYPE_CHECKING:
+    import requests
 
-from api import Pagination
-from config import API_BASE_URL
+from api import Pagination, PageStream, CachedPage
+from config import API_BASE_URLS, API_TIMEOUT_SECONDS, API_PAGE_LIMIT, API_MAX_WORKERS, API_STREAM_CHUNK_SIZE, \
+    API_HEDGE_AFTER_SECONDS, API_RETRIES
+from endpoints import EndpointPool, Endpoint
+from metrics import record, timed, increment
+from serialization import loads, backend as json_backend
+
+T = TypeVar("T")
 
 
 class NodeStatus(object):
@@ -23,22 +33,22 @@ class Peer(object):
         self.latency: int = latency
 
 
-class VotingFor(object):
-    def __init__(self, username: str, percent: float, votes: int):
-        self.username: str = username
-        self.percent: float = percent
-        self.votes: int = votes
-
-
 class Wallet(object):
-    def __init__(self, address: str, public_key: str, username: Optional[str], balance: int, nonce: int,
-                 voting_for: [VotingFor]):
+    # only the fields the messenger uses are kept, the api entry itself is not retained
+    # votes are those for the block producer the wallet was parsed for
+    __slots__ = ("address", "votes", "balance")
+
+    def __init__(self, address: str, votes: int, balance: int):
         self.address: str = address
-        self.public_key: str = public_key
-        self.username: Optional[str] = username
+        self.votes: int = votes
         self.balance: int = balance
-        self.nonce: int = nonce
-        self.voting_for: [VotingFor] = voting_for
+
+
+class Transaction(object):
+    def __init__(self, sender: Optional[str], recipients: [str], is_vote: bool):
+        self.sender: Optional[str] = sender
+        self.recipients: [str] = recipients
+        self.is_vote: bool = is_vote
 
 
 def parse_node_status(data) -> NodeStatus:
@@ -64,79 +74,358 @@ def parse_peers(data) -> [Peer]:
     return list(map(lambda entry: parse_peer(entry), data))
 
 
-def parse_voting_for(data) -> [VotingFor]:
-    voting_for: [VotingFor] = []
-    for username, voting_for_data in data.items():
-        voting_for.append(VotingFor(
-            username=username,
-            percent=voting_for_data["percent"],
-            votes=int(voting_for_data["votes"])
-        ))
-    return voting_for
+def parse_votes(data_entry, username: Optional[str]) -> int:
+    # votingFor is keyed on block producer username
+    voting_for = data_entry["votingFor"].get(username) if "votingFor" in data_entry else None
+    return 0 if voting_for is None else int(voting_for["votes"])
 
 
-def parse_wallet(data_entry) -> Wallet:
-    username = None
-    if "attributes" in data_entry:
-        attributes = data_entry["attributes"]
-        if "delegate" in attributes:
-            username = attributes["delegate"]["username"]
+def parse_wallet(data_entry, username: Optional[str] = None) -> Wallet:
     return Wallet(
         address=data_entry["address"],
-        public_key=data_entry["publicKey"] if "publicKey" in data_entry else None,
-        username=username,
-        balance=int(data_entry["balance"]),
-        nonce=int(data_entry["nonce"]),
-        voting_for=parse_voting_for(data_entry["votingFor"])
+        votes=parse_votes(data_entry, username),
+        balance=int(data_entry["balance"])
     )
 
 
-def parse_wallets(data) -> [Wallet]:
-    return list(map(lambda entry: parse_wallet(entry), data))
+def parse_wallets(data, username: Optional[str] = None) -> [Wallet]:
+    return list(map(lambda entry: parse_wallet(entry, username), data))
+
+
+def parse_transaction(data_entry) -> Transaction:
+    asset = data_entry["asset"] if "asset" in data_entry and data_entry["asset"] is not None else {}
+    recipients = [transfer["recipientId"] for transfer in asset["transfers"]] if "transfers" in asset else []
+    if "recipient" in data_entry and data_entry["recipient"] is not None:
+        recipients.append(data_entry["recipient"])
+    return Transaction(
+        sender=data_entry["sender"] if "sender" in data_entry else None,
+        recipients=recipients,
+        is_vote="votes" in asset
+    )
+
+
+# server side voter orderings, tried in sequence, with the key the api is expected to sort on
+# a voter's votes never exceed its balance, so a balance ordering is also safe to stop early on
+VOTERS_SORT_ORDERS: Dict[str, Callable[[Wallet], int]] = {
+    "votingFor.{username}.votes:desc": lambda wallet: wallet.votes,
+    "balance:desc": lambda wallet: wallet.balance,
+}
+
+
+def build_session() -> "requests.Session":
+    # requests is imported on first use, runs that exit before talking to the api don't pay for it
+    import requests
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=len(API_BASE_URLS), pool_maxsize=API_MAX_WORKERS)
+    new_session = requests.Session()
+    new_session.headers["Accept-Encoding"] = "gzip, deflate"
+    new_session.mount("http://", adapter)
+    new_session.mount("https://", adapter)
+    return new_session
+
+
+session: Optional["requests.Session"] = None
+endpoint_pool = EndpointPool(API_BASE_URLS)
+# runs the requests to additional endpoints, separate from the page executors that wait on them
+request_executor = ThreadPoolExecutor(max_workers=API_MAX_WORKERS * max(len(API_BASE_URLS), 1))
+
+
+def get_session() -> "requests.Session":
+    global session
+    if session is None:
+        session = build_session()
+    return session
+
+
+def request_endpoint(
+        endpoint: Endpoint,
+        path: str,
+        params: Optional[Dict],
+        stream: bool,
+        headers: Optional[Dict[str, str]]
+) -> "requests.Response":
+    start = time.perf_counter()
+    try:
+        response = get_session().get(
+            endpoint.base_url + path, params=params, timeout=API_TIMEOUT_SECONDS, stream=stream, headers=headers
+        )
+    except Exception:
+        endpoint_pool.record_failure(endpoint)
+        raise
+    if response.status_code >= 500 or response.status_code == 429:
+        endpoint_pool.record_failure(endpoint)
+        response.close()
+        raise Exception(f"{endpoint.base_url} responded with status {response.status_code}")
+    endpoint_pool.record_success(endpoint, time.perf_counter() - start)
+    return response
+
+
+def close_response(future: Future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def get(
+        path: str,
+        params: Optional[Dict] = None,
+        stream: bool = False,
+        headers: Optional[Dict[str, str]] = None
+) -> "requests.Response":
+    # reads go to the fastest healthy endpoint, the next endpoint is asked when it fails
+    # or, with API_HEDGE_AFTER_SECONDS set, when it is slow, the first response wins
+    endpoints = endpoint_pool.ranked()
+    if not endpoints:
+        raise Exception("No api url configured in API_BASE_URLS")
+    if len(endpoints) == 1:
+        return request_endpoint(endpoints[0], path, params, stream, headers)
+    remaining = iter(endpoints)
+    pending = {request_executor.submit(request_endpoint, next(remaining), path, params, stream, headers)}
+    last_error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, timeout=API_HEDGE_AFTER_SECONDS, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.add_done_callback(close_response)
+                return future.result()
+            last_error = future.exception()
+        if done or API_HEDGE_AFTER_SECONDS is not None:
+            endpoint = next(remaining, None)
+            if endpoint is not None:
+                pending.add(request_executor.submit(request_endpoint, endpoint, path, params, stream, headers))
+    raise last_error
+
+
+def stream_page(
+        pagination: Pagination,
+        page: int,
+        parse_entry: Callable[[Dict], Any],
+        keep: Optional[Callable[[Any], bool]] = None
+) -> Optional[Tuple[Dict, list]]:
+    # entries are decoded and filtered while the body is read, only the kept entries of a page are retained
+    start = time.perf_counter()
+    with get(pagination.uri, params=pagination.get_params(page), stream=True) as response:
+        received = time.perf_counter()
+        record("page_fetch", received - start)
+        if response.status_code != 200:
+            return None
+        if json_backend.fast:
+            # a fast backend decodes a whole page quicker than the incremental decoder, memory is still one page
+            fields = loads(response.content)
+            data = fields["data"]
+        else:
+            if response.encoding is None:
+                response.encoding = "utf-8"
+            data = PageStream(response.iter_content(chunk_size=API_STREAM_CHUNK_SIZE, decode_unicode=True))
+            fields = data.fields
+        entries = map(parse_entry, data)
+        result = list(entries) if keep is None else [entry for entry in entries if keep(entry)]
+        record("page_decode", time.perf_counter() - received, response.raw.tell())
+        return fields["meta"], result
+
+
+def stream_cached_page(
+        pagination: Pagination,
+        page: int,
+        cached_page: Optional[CachedPage],
+        decode: Callable[[list], Any]
+) -> Optional[CachedPage]:
+    # an unchanged page is answered with 304 by apis that support etags, or recognized by the digest of its body
+    # otherwise, either way its cached entries are used instead of decoding it again
+    headers = None if cached_page is None or cached_page.etag is None else {"If-None-Match": cached_page.etag}
+    start = time.perf_counter()
+    with get(pagination.uri, params=pagination.get_params(page), headers=headers) as response:
+        received = time.perf_counter()
+        record("page_fetch", received - start)
+        if response.status_code == 304 and cached_page is not None:
+            increment("pages_not_modified")
+            return cached_page
+        if response.status_code != 200:
+            return None
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        etag = response.headers.get("ETag")
+        if cached_page is not None and cached_page.digest == digest:
+            increment("pages_unchanged")
+            return CachedPage(etag, digest, cached_page.meta, cached_page.entries)
+        fields = loads(content)
+        entries = decode(fields["data"])
+        record("page_decode", time.perf_counter() - received, len(content))
+        return CachedPage(etag, digest, fields["meta"], entries)
+
+
+def retry_page(pagination: Pagination, fetch: Callable[[], Optional[T]]) -> Optional[T]:
+    # connection errors, timeouts and 5xx responses are retried with backoff, other responses are final
+    for attempt in range(API_RETRIES + 1):
+        try:
+            return fetch()
+        except Exception:
+            if attempt == API_RETRIES:
+                return None
+            time.sleep(pagination.get_backoff_seconds(attempt))
+
+
+def fetch_page(
+        pagination: Pagination,
+        page: int,
+        parse_entry: Callable[[Dict], Any],
+        keep: Optional[Callable[[Any], bool]] = None
+) -> Optional[Tuple[Dict, list]]:
+    return retry_page(pagination, lambda: stream_page(pagination, page, parse_entry, keep))
+
+
+def get_cached_pages(
+        pagination: Pagination,
+        cached_pages: Dict[int, CachedPage],
+        decode: Callable[[list], Any]
+) -> Dict[int, CachedPage]:
+    # like iter_paginated, with the pages of an earlier run to check against
+    def fetch_cached_page(page: int) -> Optional[CachedPage]:
+        return retry_page(
+            pagination, lambda: stream_cached_page(pagination, page, cached_pages.get(page), decode)
+        )
+
+    pages: Dict[int, CachedPage] = {}
+    first_page = fetch_cached_page(1)
+    if first_page is None:
+        return pages
+    pages[1] = first_page
+    pagination.set_page_count(first_page.meta)
+    remaining_pages = range(2, pagination.page_count + 1)
+    with ThreadPoolExecutor(max_workers=API_MAX_WORKERS) as executor:
+        remaining_results = list(executor.map(fetch_cached_page, remaining_pages))
+    for page, cached_page in zip(remaining_pages, remaining_results):
+        if cached_page is None:
+            return pages
+        pages[page] = cached_page
+    pagination.complete = True
+    return pages
+
+
+def iter_paginated(
+        pagination: Pagination,
+        parse_entry: Callable[[Dict], Any],
+        keep: Optional[Callable[[Any], bool]] = None
+) -> Iterator[Any]:
+    # the first page tells how many pages there are, the remaining pages are fetched concurrently
+    first_page = fetch_page(pagination, 1, parse_entry, keep)
+    if first_page is None:
+        return
+    meta, result = first_page
+    pagination.set_page_count(meta)
+    yield from result
+    if pagination.page_count <= 1:
+        pagination.complete = True
+        return
+    executor = ThreadPoolExecutor(max_workers=API_MAX_WORKERS)
+    try:
+        pages = range(2, pagination.page_count + 1)
+        for page_result in executor.map(lambda page: fetch_page(pagination, page, parse_entry, keep), pages):
+            if page_result is None:
+                return
+            yield from page_result[1]
+        pagination.complete = True
+    finally:
+        # pages not started yet are cancelled when the caller stops iterating early
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
 def get_node_status() -> NodeStatus:
-    uri = API_BASE_URL + "/node/status"
-    response = requests.get(uri, timeout=10)
+    with timed("node_status"):
+        response = get("/node/status")
+        response.raise_for_status()
+
+        json_response = loads(response.content)
+        return parse_node_status(json_response["data"])
+
+
+def get_wallet(address: str, username: Optional[str] = None) -> Optional[Wallet]:
+    response = get(f"/wallets/{address}")
+    if response.status_code == 404:
+        return None
     response.raise_for_status()
 
-    json_response = response.json()
-    return parse_node_status(json_response["data"])
+    json_response = loads(response.content)
+    return parse_wallet(json_response["data"], username)
 
 
-def get_peers(pagination: Pagination = None) -> [Peer]:
+def get_wallets(addresses: [str], username: Optional[str] = None) -> Dict[str, Optional[Wallet]]:
+    with ThreadPoolExecutor(max_workers=API_MAX_WORKERS) as executor:
+        return dict(zip(addresses, executor.map(lambda address: get_wallet(address, username), addresses)))
+
+
+def get_transactions(height_from: int, height_to: int, pagination: Pagination = None) -> Iterator[Transaction]:
+    if pagination is None:
+        pagination = Pagination(
+            "/transactions",
+            API_PAGE_LIMIT,
+            params={"height.from": height_from, "height.to": height_to}
+        )
+    return iter_paginated(pagination, parse_transaction)
+
+
+def iter_peers(pagination: Pagination = None) -> Iterator[Peer]:
     if pagination is None:
         pagination = Pagination(
-            API_BASE_URL + "/peers"
+            "/peers",
+            API_PAGE_LIMIT
         )
-    uri = pagination.get_uri()
-    response = requests.get(uri, timeout=10)
-    if response.status_code != 200:
-        return pagination.result
+    return iter_paginated(pagination, parse_peer)
 
-    json_response = response.json()
-    next = json_response["meta"]["next"]
-    result = parse_peers(json_response["data"])
-    if next is None:
-        return pagination.to_result(result)
-    else:
-        return get_peers(pagination.to_next(API_BASE_URL + next, result))
+
+def get_peers(pagination: Pagination = None) -> [Peer]:
+    return list(iter_peers(pagination))
 
 
-def get_voters(username: str, pagination: Pagination = None) -> [Wallet]:
+def get_voters(
+        username: str,
+        keep: Optional[Callable[[Wallet], bool]] = None,
+        pagination: Pagination = None
+) -> Iterator[Wallet]:
     if pagination is None:
         pagination = Pagination(
-            f"{API_BASE_URL}/delegates/{username}/voters"
+            f"/delegates/{username}/voters",
+            API_PAGE_LIMIT
         )
-    uri = pagination.get_uri()
-    response = requests.get(uri)
-    if response.status_code != 200:
-        return pagination.result
-
-    json_response = response.json()
-    next = json_response["meta"]["next"]
-    result = parse_wallets(json_response["data"])
-    if next is None:
-        return pagination.to_result(result)
-    else:
-        return get_voters(username, pagination.to_next(API_BASE_URL + next, result))
+    return iter_paginated(pagination, lambda entry: parse_wallet(entry, username), keep)
+
+
+def get_voters_sorted(
+        username: str,
+        order_by: str,
+        key: Callable[[Wallet], int],
+        vote_cap: int
+) -> Optional[List[Wallet]]:
+    # returns None when the api does not support or does not apply the requested ordering
+    pagination = Pagination(
+        f"/delegates/{username}/voters",
+        API_PAGE_LIMIT,
+        order_by=order_by.format(username=username)
+    )
+    previous_key: Optional[int] = None
+    page = 1
+    while True:
+        page_result = fetch_page(pagination, page, lambda entry: parse_wallet(entry, username))
+        if page_result is None:
+            return None
+        meta, wallets = page_result
+        keys = [key(wallet) for wallet in wallets]
+        if previous_key is not None:
+            keys.insert(0, previous_key)
+        if any(current < following for current, following in zip(keys, keys[1:])):
+            return None
+        pagination.to_result([wallet for wallet in wallets if key(wallet) > vote_cap])
+        pagination.set_page_count(meta)
+        if not wallets or keys[-1] <= vote_cap or page >= pagination.page_count:
+            return pagination.result
+        previous_key = keys[-1]
+        page += 1
+
+
+def get_voters_over_cap_sorted(username: str, vote_cap: int) -> Optional[List[Wallet]]:
+    # result may contain voters under the vote cap when sorted on balance, the caller still filters on votes
+    for order_by, key in VOTERS_SORT_ORDERS.items():
+        voters = get_voters_sorted(username, order_by, key, vote_cap)
+        if voters is not None:
+            return voters
+    return None
@@ -1,32 +1,393 @@
-import json
-from typing import Dict
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Iterator, Any, Set
+
+from api import CachedPage
+from error import handle_error
+from metrics import timed
+from producers import producers
+from serialization import load, loads, dumps
 
 DATA_FILE_NAME = "data.json"
+DATABASE_FILE_NAME = "data.db"
+ACTIVATIONS_TABLE = "CREATE TABLE IF NOT EXISTS activations (producer TEXT NOT NULL, address TEXT NOT NULL, " \
+                    "count INTEGER NOT NULL, PRIMARY KEY (producer, address))"
+VOTER_INDEX_TABLE = "CREATE TABLE IF NOT EXISTS voter_index (producer TEXT NOT NULL, address TEXT NOT NULL, " \
+                    "votes INTEGER NOT NULL, PRIMARY KEY (producer, address))"
+VOTER_SCHEDULE_TABLE = "CREATE TABLE IF NOT EXISTS voter_schedule (producer TEXT NOT NULL, address TEXT NOT NULL, " \
+                      "due INTEGER NOT NULL, PRIMARY KEY (producer, address))"
+VOTER_PAGES_TABLE = "CREATE TABLE IF NOT EXISTS voter_pages (producer TEXT NOT NULL, page INTEGER NOT NULL, " \
+                    "etag TEXT, digest TEXT NOT NULL, meta TEXT NOT NULL, voters TEXT NOT NULL, " \
+                    "PRIMARY KEY (producer, page))"
+ACTIVATIONS_ARCHIVE_TABLE = "CREATE TABLE IF NOT EXISTS activations_archive (producer TEXT NOT NULL, " \
+                            "address TEXT NOT NULL, count INTEGER NOT NULL, archived INTEGER NOT NULL, due INTEGER, " \
+                            "PRIMARY KEY (producer, address))"
+# the maximum amount of variables in one sqlite statement is 999 for older sqlite versions
+QUERY_VARIABLES_LIMIT = 900
+PRODUCER_STATE_KEYS = ["last_activation_timestamp", "last_sync_height"]
+
+connection: Optional[sqlite3.Connection] = None
+# producers are synced from several threads, their writes to the shared connection take turns
+lock = threading.RLock()
+is_run_transaction = False
+# last known stored rows per producer, used to only write the entries that changed
+stored_activations: Dict[str, Dict[str, int]] = {}
+stored_voter_index: Dict[str, Dict[str, int]] = {}
+
+
+def get_connection() -> sqlite3.Connection:
+    global connection
+    if connection is None:
+        new_connection = sqlite3.connect(DATABASE_FILE_NAME, isolation_level=None, check_same_thread=False)
+        try:
+            new_connection.execute("PRAGMA journal_mode=WAL")
+            new_connection.execute("PRAGMA synchronous=NORMAL")
+            new_connection.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            new_connection.execute(ACTIVATIONS_TABLE)
+            new_connection.execute(VOTER_INDEX_TABLE)
+            new_connection.execute(VOTER_SCHEDULE_TABLE)
+            new_connection.execute(VOTER_PAGES_TABLE)
+            new_connection.execute(ACTIVATIONS_ARCHIVE_TABLE)
+            new_connection.execute(
+                "CREATE INDEX IF NOT EXISTS activations_archive_archived ON activations_archive (producer, archived)"
+            )
+            new_connection.execute("CREATE INDEX IF NOT EXISTS voter_schedule_due ON voter_schedule (producer, due)")
+            new_connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires INTEGER NOT NULL)"
+            )
+            migrate_data_file(new_connection)
+        except BaseException:
+            # the next call tries again, including the migrations
+            new_connection.close()
+            raise
+        connection = new_connection
+    return connection
+
+
+def migrate_data_file(db: sqlite3.Connection):
+    # imports a data.json file from before the database existed, the file is kept as data.json.migrated
+    if not os.path.exists(DATA_FILE_NAME):
+        return
+    try:
+        with open(DATA_FILE_NAME, "r") as infile:
+            data = load(infile)
+    except Exception as e:
+        # an unreadable file counts as empty state, as it did before the database, and is kept for inspection
+        handle_error(e, f"Failed to read {DATA_FILE_NAME}, it is kept as {DATA_FILE_NAME}.corrupt", False)
+        os.replace(DATA_FILE_NAME, DATA_FILE_NAME + ".corrupt")
+        return
+    producer = producers[0].username
+    with migration(db):
+        db.executemany(
+            "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+            ((f"{key}:{producer}", data[key]) for key in PRODUCER_STATE_KEYS if key in data)
+        )
+        if "activations" in data:
+            db.executemany(
+                "INSERT OR REPLACE INTO activations (producer, address, count) VALUES (?, ?, ?)",
+                ((producer, address, count) for address, count in data["activations"].items())
+            )
+        if "voter_index" in data:
+            db.executemany(
+                "INSERT OR REPLACE INTO voter_index (producer, address, votes) VALUES (?, ?, ?)",
+                ((producer, address, votes) for address, votes in data["voter_index"].items())
+            )
+    os.replace(DATA_FILE_NAME, DATA_FILE_NAME + ".migrated")
+
+
+@contextmanager
+def migration(db: sqlite3.Connection) -> Iterator[None]:
+    # migrations run before the shared connection is set, so they can't use write()
+    with lock:
+        db.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+
+@contextmanager
+def write() -> Iterator[sqlite3.Connection]:
+    # writes join the run transaction when there is one, otherwise they are committed right away
+    db = get_connection()
+    with lock:
+        if is_run_transaction:
+            yield db
+            return
+        db.execute("BEGIN")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+
+@contextmanager
+def run_transaction() -> Iterator[None]:
+    # all state changes of a run are stored at once, or not at all when the run fails
+    global is_run_transaction
+    db = get_connection()
+    db.execute("BEGIN")
+    is_run_transaction = True
+    try:
+        yield
+    except BaseException:
+        is_run_transaction = False
+        db.execute("ROLLBACK")
+        stored_activations.clear()
+        stored_voter_index.clear()
+        raise
+    is_run_transaction = False
+    with timed("persist"):
+        db.execute("COMMIT")
+
+
+@contextmanager
+def producer_transaction(producer: str) -> Iterator[None]:
+    # undoes the changes of one producer when it fails, without losing those of the other producers in the run
+    db = get_connection()
+    db.execute("SAVEPOINT producer")
+    try:
+        yield
+    except BaseException:
+        db.execute("ROLLBACK TO producer")
+        db.execute("RELEASE producer")
+        stored_activations.pop(producer, None)
+        stored_voter_index.pop(producer, None)
+        raise
+    db.execute("RELEASE producer")
+
+
+def get_state(key: str) -> int:
+    row = get_connection().execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+    return 0 if row is None else row[0]
+
+
+def set_state(key: str, value: int):
+    with write() as db:
+        db.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+
+def load_rows(query: str, producer: str) -> Dict[str, int]:
+    return dict(get_connection().execute(query, (producer,)).fetchall())
+
+
+def store_changed_rows(table: str, column: str, producer: str, stored: Dict[str, int], rows: Dict[str, int]):
+    with timed("persist"), write() as db:
+        db.executemany(
+            f"INSERT OR REPLACE INTO {table} (producer, address, {column}) VALUES (?, ?, ?)",
+            ((producer, address, value) for address, value in rows.items() if stored.get(address) != value)
+        )
+        db.executemany(
+            f"DELETE FROM {table} WHERE producer = ? AND address = ?",
+            ((producer, address) for address in stored if address not in rows)
+        )
+
+
+def get_last_activation_timestamp(producer: str) -> int:
+    return get_state(f"last_activation_timestamp:{producer}")
+
+
+def set_last_activation_timestamp(producer: str, timestamp: int):
+    set_state(f"last_activation_timestamp:{producer}", timestamp)
+
+
+def get_activations(producer: str) -> Dict[str, int]:
+    stored_activations[producer] = load_rows("SELECT address, count FROM activations WHERE producer = ?", producer)
+    return dict(stored_activations[producer])
+
+
+def set_activations(producer: str, activations: Dict[str, int]):
+    if producer not in stored_activations:
+        stored_activations[producer] = load_rows("SELECT address, count FROM activations WHERE producer = ?", producer)
+    store_changed_rows("activations", "count", producer, stored_activations[producer], activations)
+    stored_activations[producer] = dict(activations)
+
+
+def get_archived_column(producer: str, column: str, addresses: [str]) -> Dict[str, int]:
+    values: Dict[str, int] = {}
+    for offset in range(0, len(addresses), QUERY_VARIABLES_LIMIT):
+        batch = addresses[offset:offset + QUERY_VARIABLES_LIMIT]
+        values.update(get_connection().execute(
+            f"SELECT address, {column} FROM activations_archive WHERE producer = ? AND {column} IS NOT NULL "
+            f"AND address IN ({', '.join('?' * len(batch))})",
+            (producer, *batch)
+        ).fetchall())
+    return values
+
+
+def get_archived_activations(producer: str, addresses: [str]) -> Dict[str, int]:
+    return get_archived_column(producer, "count", addresses)
+
+
+def get_archived_dues(producer: str, addresses: [str]) -> Dict[str, int]:
+    return get_archived_column(producer, "due", addresses)
+
+
+def archive_activations(producer: str, activations: Dict[str, int], timestamp: int):
+    # a voter keeps the due time it had in the voter schedule, it is due again at that time when back over the cap
+    with timed("persist"), write() as db:
+        db.executemany(
+            "INSERT OR REPLACE INTO activations_archive (producer, address, count, archived, due) VALUES "
+            "(?, ?, ?, ?, (SELECT due FROM voter_schedule WHERE producer = ? AND address = ?))",
+            ((producer, address, count, timestamp, producer, address) for address, count in activations.items())
+        )
+
+
+def delete_archived_activations(producer: str, addresses: [str]):
+    with timed("persist"), write() as db:
+        db.executemany(
+            "DELETE FROM activations_archive WHERE producer = ? AND address = ?",
+            ((producer, address) for address in addresses)
+        )
+
+
+def evict_archived_activations(producer: str, archived_before: int) -> int:
+    # returns the amount of evicted activations, due times left for the evicted voters are removed as well
+    with timed("persist"), write() as db:
+        db.execute(
+            "DELETE FROM voter_schedule WHERE producer = ? AND address IN "
+            "(SELECT address FROM activations_archive WHERE producer = ? AND archived < ?)",
+            (producer, producer, archived_before)
+        )
+        return db.execute(
+            "DELETE FROM activations_archive WHERE producer = ? AND archived < ?", (producer, archived_before)
+        ).rowcount
+
+
+def get_last_nonce(address: str) -> int:
+    return get_state(f"last_nonce:{address}")
+
+
+def set_last_nonce(address: str, nonce: int):
+    set_state(f"last_nonce:{address}", nonce)
+
+
+def get_last_sync_height(producer: str) -> int:
+    return get_state(f"last_sync_height:{producer}")
+
+
+def get_last_full_sync_height(producer: str) -> int:
+    return get_state(f"last_full_sync_height:{producer}")
+
+
+def get_last_full_sync_timestamp(producer: str) -> int:
+    return get_state(f"last_full_sync_timestamp:{producer}")
+
+
+def set_last_full_sync(producer: str, height: int, timestamp: int):
+    set_state(f"last_full_sync_height:{producer}", height)
+    set_state(f"last_full_sync_timestamp:{producer}", timestamp)
+
+
+def get_voter_index(producer: str) -> Dict[str, int]:
+    stored_voter_index[producer] = load_rows("SELECT address, votes FROM voter_index WHERE producer = ?", producer)
+    return dict(stored_voter_index[producer])
+
+
+def set_voter_index(producer: str, voter_index: Dict[str, int], height: int):
+    if producer not in stored_voter_index:
+        stored_voter_index[producer] = load_rows("SELECT address, votes FROM voter_index WHERE producer = ?", producer)
+    store_changed_rows("voter_index", "votes", producer, stored_voter_index[producer], voter_index)
+    stored_voter_index[producer] = dict(voter_index)
+    set_state(f"last_sync_height:{producer}", height)
+
+
+def get_voter_pages(producer: str) -> Dict[int, CachedPage]:
+    rows = get_connection().execute(
+        "SELECT page, etag, digest, meta, voters FROM voter_pages WHERE producer = ?", (producer,)
+    )
+    return {page: CachedPage(etag, digest, loads(meta), loads(voters)) for page, etag, digest, meta, voters in rows}
+
+
+def get_voter_snapshot_height(producer: str) -> int:
+    return get_state(f"voter_snapshot_height:{producer}")
+
+
+def set_voter_pages(producer: str, pages: Dict[int, CachedPage], page_count: int, height: int):
+    # only the changed pages are given, pages past the page count are left over from a larger voter list
+    with timed("persist"), write() as db:
+        db.executemany(
+            "INSERT OR REPLACE INTO voter_pages (producer, page, etag, digest, meta, voters) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (producer, page, page_data.etag, page_data.digest, dumps(page_data.meta), dumps(page_data.entries))
+                for page, page_data in pages.items()
+            )
+        )
+        db.execute("DELETE FROM voter_pages WHERE producer = ? AND page > ?", (producer, page_count))
+    set_state(f"voter_snapshot_height:{producer}", height)
+
+
+def get_due_addresses(producer: str, timestamp: int) -> Set[str]:
+    rows = get_connection().execute(
+        "SELECT address FROM voter_schedule WHERE producer = ? AND due <= ?", (producer, timestamp)
+    )
+    return {row[0] for row in rows}
+
+
+def get_next_due(producer: str, timestamp: int) -> Optional[int]:
+    row = get_connection().execute(
+        "SELECT MIN(due) FROM voter_schedule WHERE producer = ? AND due > ?", (producer, timestamp)
+    ).fetchone()
+    return row[0]
+
+
+def set_voter_dues(producer: str, dues: Dict[str, int]):
+    with write() as db:
+        db.executemany(
+            "INSERT OR REPLACE INTO voter_schedule (producer, address, due) VALUES (?, ?, ?)",
+            ((producer, address, due) for address, due in dues.items())
+        )
+
+
+def delete_voter_dues(producer: str, addresses: [str]):
+    with write() as db:
+        db.executemany(
+            "DELETE FROM voter_schedule WHERE producer = ? AND address = ?",
+            ((producer, address) for address in addresses)
+        )
+
 
-try:
-    data = json.load(open(DATA_FILE_NAME, "r"))
-except Exception:
-    data = {}
+def is_voter_schedule_seeded(producer: str) -> bool:
+    return get_state(f"voter_schedule_seeded:{producer}") != 0
 
 
-def get_last_activation_timestamp() -> int:
-    return data["last_activation_timestamp"] if "last_activation_timestamp" in data else 0
+def seed_voter_schedule(producer: str, dues: Dict[str, int]):
+    # voters that already have a due time keep it
+    with write() as db:
+        db.executemany(
+            "INSERT OR IGNORE INTO voter_schedule (producer, address, due) VALUES (?, ?, ?)",
+            ((producer, address, due) for address, due in dues.items())
+        )
+    set_state(f"voter_schedule_seeded:{producer}", 1)
 
 
-def set_last_activation_timestamp(timestamp: int):
-    data["last_activation_timestamp"] = timestamp
-    save_data()
+def unseed_voter_schedule(producer: str):
+    # voters activated while the schedule is not used get a due time when it is used again
+    set_state(f"voter_schedule_seeded:{producer}", 0)
 
 
-def get_activations() -> Dict[str, int]:
-    return data["activations"] if "activations" in data else {}
+def get_cached(key: str) -> Optional[Any]:
+    row = get_connection().execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+    if row is None or row[1] <= time.time():
+        return None
+    return loads(row[0])
 
 
-def set_activations(activations: Dict[str, int]):
-    data["activations"] = activations
-    save_data()
+def set_cached(key: str, value: Any, ttl_seconds: int):
+    with write() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, dumps(value), int(time.time()) + ttl_seconds)
+        )
 
 
-def save_data():
-    with open(DATA_FILE_NAME, "w+") as outfile:
-        json.dump(data, outfile, default=vars)
+def delete_cached(key: str):
+    with write() as db:
+        db.execute("DELETE FROM cache WHERE key = ?", (key,))
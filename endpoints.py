@@ -0,0 +1,52 @@
+import threading
+import time
+from typing import Optional
+
+from config import API_ENDPOINT_COOLDOWN_SECONDS
+
+# weight of a new latency measurement in the moving average
+LATENCY_SMOOTHING = 0.3
+
+
+class Endpoint(object):
+    def __init__(self, base_url: str):
+        self.base_url: str = base_url
+        self.latency: Optional[float] = None
+        self.failures: int = 0
+        self.unhealthy_until: float = 0
+
+    def is_healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+
+class EndpointPool(object):
+    def __init__(self, base_urls: [str]):
+        self.endpoints: [Endpoint] = [Endpoint(base_url) for base_url in base_urls]
+        self.lock = threading.Lock()
+
+    def ranked(self) -> [Endpoint]:
+        # healthy endpoints by latency, endpoints without a measurement first so they get one, unhealthy ones last
+        with self.lock:
+            return sorted(
+                self.endpoints,
+                key=lambda endpoint: (
+                    not endpoint.is_healthy(),
+                    0 if endpoint.latency is None else endpoint.latency
+                )
+            )
+
+    def record_success(self, endpoint: Endpoint, latency: float):
+        with self.lock:
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency = LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * endpoint.latency
+            endpoint.failures = 0
+            endpoint.unhealthy_until = 0
+
+    def record_failure(self, endpoint: Endpoint):
+        # consecutive failures keep an endpoint out of rotation for longer
+        with self.lock:
+            endpoint.failures += 1
+            cooldown = API_ENDPOINT_COOLDOWN_SECONDS * 2 ** min(endpoint.failures - 1, 5)
+            endpoint.unhealthy_until = time.monotonic() + cooldown
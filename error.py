@@ -1,9 +1,15 @@
 import time
 import traceback
-from typing import Optional
+from typing import Optional, IO
+
+ERROR_LOG_FILE_NAME = "logs/error.log"
+
+# opened once, the daemon logs many errors over its lifetime
+error_log: Optional[IO] = None
 
 
 def handle_error(e: Optional[Exception], message: str, fatal: bool):
+    global error_log
     if e is None:
         short_message = "fatal:{0} | {1}".format(str(fatal), message)
         full_message = "\n" + short_message
@@ -12,8 +18,9 @@ def handle_error(e: Optional[Exception], message: str, fatal: bool):
         full_message = "\n" + short_message + "\n\n" + traceback.format_exc()
     log_message = time.strftime("%Y-%m-%d %H:%M:%S: ") + full_message
     print(log_message)
-    file = open("logs/error.log", "a")
-    file.write(log_message + "\n")
-    file.close()
+    if error_log is None:
+        error_log = open(ERROR_LOG_FILE_NAME, "a")
+    error_log.write(log_message + "\n")
+    error_log.flush()
     if fatal:
         quit(code=1)
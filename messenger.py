@@ -1,14 +1,30 @@
 from argparse import ArgumentParser, ArgumentTypeError
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, time, timedelta
+from itertools import filterfalse
+from time import sleep
 from typing import Dict, Optional
 
-from config import SYNC_CHECK_BLOCK_THRESHOLD, MESSAGE, WALLET_MNEMONIC, WALLET_SECOND_MNEMONIC, VOTE_CAP, \
-    MESSAGE_INTERVAL_SECONDS, BLOCK_PRODUCER_USERNAME, MESSAGE_LIMIT_PER_VOTER, EXCLUDE_VOTERS
-from core_api import get_node_status, Peer, get_peers, Wallet, get_voters, VotingFor
-from data import get_last_activation_timestamp, set_last_activation_timestamp, get_activations, set_activations
+from config import SYNC_CHECK_BLOCK_THRESHOLD, MESSAGE_INTERVAL_SECONDS, MESSAGE_LIMIT_PER_VOTER, \
+    API_SORTED_SCAN_ENABLED, INCREMENTAL_SYNC_ENABLED, DAEMON_POLL_INTERVAL_SECONDS, SYNC_CHECK_ENABLED, \
+    SYNC_CHECK_PEERS_QUORUM, SYNC_CHECK_CACHE_SECONDS, API_PAGE_LIMIT, API_MAX_WORKERS, VOTER_SCHEDULE_ENABLED, \
+    ACTIVATION_ARCHIVE_SECONDS, VOTER_SNAPSHOT_ENABLED
+from api import Pagination
+from core_api import get_node_status, iter_peers, get_voters, get_voters_over_cap_sorted, NodeStatus
+from data import get_last_activation_timestamp, set_last_activation_timestamp, get_activations, set_activations, \
+    run_transaction, producer_transaction, get_due_addresses, get_next_due, set_voter_dues, is_voter_schedule_seeded, \
+    seed_voter_schedule, unseed_voter_schedule, get_archived_activations, archive_activations, \
+    delete_archived_activations, evict_archived_activations, delete_voter_dues, get_last_full_sync_timestamp, \
+    get_archived_dues
 from error import handle_error
-from transaction import transfer, Payment
+from metrics import timed, increment, reset as reset_metrics, write_metrics, format_phases
+from producers import Producer, producers
+from selection import VoterColumns, columns_from_index, columns_from_wallets, select_over_cap, \
+    select_voters_to_message, select_due_voters, spread_dues
 from utils import from_atomic_formatted, time_delta_formatted
+from voter_index import sync_voter_index
+from voter_snapshot import get_voter_snapshot
 
 ALLOW_NEW_ACTIVE_PERCENTAGE = 0.05
 ALLOW_NEW_ACTIVE_SECONDS = 2 * 60 * 60
@@ -43,6 +59,18 @@ parser.add_argument(
     help="Use this flag to run the script in development mode, data storage behavior will be changed",
     required=False
 )
+parser.add_argument(
+    "-dm", "--daemon",
+    action="store_true",
+    help="Use this flag to keep the script running, checking for new voters every DAEMON_POLL_INTERVAL_SECONDS",
+    required=False
+)
+parser.add_argument(
+    "-p", "--profile",
+    action="store_true",
+    help="Use this flag to profile the run with cProfile, the stats are printed and written to the logs directory",
+    required=False
+)
 parser.add_argument(
     "-st", "--settime",
     type=parse_set_time,
@@ -55,66 +83,204 @@ parser.add_argument(
     help="Change the weekday of the interval, '0' (Monday) - '6' (Sunday)",
     required=False
 )
-args = parser.parse_args()
 
 now = int(datetime.now().timestamp())
+# the producers whose run stopped on a fatal error, the others still store and send
+failed_producers: [str] = []
+# the last successful node status check, reused for SYNC_CHECK_CACHE_SECONDS by the daemon
+verified_node_status: Optional[NodeStatus] = None
+verified_node_status_time = 0
+
+
+def log(producer: Producer, message: str):
+    # the username tells the output of multiple producers apart
+    print(message if len(producers) == 1 else f"[{producer.username}] {message}")
 
 
-def send_messages(voters_to_message: [Wallet]):
-    payments = [Payment(voter.address, 1) for voter in voters_to_message]
+def send_messages(producer: Producer, addresses: [str]) -> [str]:
+    # returns the addresses of the voters that could not be messaged
+    # the client and crypto libraries are only imported by runs that send, other runs start faster without them
+    from transaction import transfer_sharded, Payment
+    payments = [Payment(address, 1) for address in addresses]
     try:
-        transfer(
-            payments=payments,
-            memo=MESSAGE,
-            fee=None,
-            sig=WALLET_MNEMONIC,
-            second_sig=WALLET_SECOND_MNEMONIC,
-            nonce=None
-        )
+        chunk_results = transfer_sharded(payments=payments, memo=producer.message, wallets=producer.wallets)
     except Exception as e:
         handle_error(e, "Failed to send messages", True)
+        return []
+    failed_addresses: [str] = []
+    for chunk_result in chunk_results:
+        if not chunk_result.accepted:
+            failed_addresses.extend(payment.recipient for payment in chunk_result.payments)
+            transaction_str = "" if chunk_result.nonce is None else f" in transaction with nonce {chunk_result.nonce}"
+            handle_error(
+                None,
+                f"Failed to send messages to {len(chunk_result.payments)} voter(s) from {chunk_result.sender}"
+                f"{transaction_str}: {chunk_result.error_message}",
+                False
+            )
+    if len(failed_addresses) == len(payments):
+        handle_error(None, "Failed to send messages", True)
+    return failed_addresses
+
+
+def revert_activations(producer: Producer, addresses: [str]):
+    activations = get_activations(producer.username)
+    for address in addresses:
+        if address in activations and activations[address] > 1:
+            activations[address] -= 1
+        else:
+            activations.pop(address, None)
+    set_activations(producer.username, activations)
+    if VOTER_SCHEDULE_ENABLED:
+        # due again on the next run
+        set_voter_dues(producer.username, dict.fromkeys(addresses, now))
+
+
+def load_activations(producer: Producer, voters: VoterColumns) -> (Dict[str, int], [str]):
+    # voters back over the vote cap get the activation count they had when they were archived
+    activations = get_activations(producer.username)
+    archived_activations = get_archived_activations(
+        producer.username, list(filterfalse(activations.__contains__, voters.addresses))
+    )
+    activations.update(archived_activations)
+    return activations, list(archived_activations)
+
+
+def store_activations(producer: Producer, activations: Dict[str, int], voters: VoterColumns, restored: [str]):
+    # only voters over the vote cap are kept in the activations every run reads and writes, the others are archived
+    # and removed from the archive after ACTIVATION_ARCHIVE_SECONDS
+    over_cap_addresses = set(voters.addresses)
+    archived_activations = {
+        address: count for address, count in activations.items() if address not in over_cap_addresses
+    }
+    for address in archived_activations:
+        del activations[address]
+    set_activations(producer.username, activations)
+    delete_archived_activations(producer.username, restored)
+    archive_activations(producer.username, archived_activations, now)
+    if VOTER_SCHEDULE_ENABLED:
+        delete_voter_dues(producer.username, list(archived_activations))
+    evicted_count = 0
+    if ACTIVATION_ARCHIVE_SECONDS is not None:
+        evicted_count = evict_archived_activations(producer.username, now - ACTIVATION_ARCHIVE_SECONDS)
+    increment("activations_archived", len(archived_activations))
+    increment("activations_restored", len(restored))
+    increment("activations_evicted", evicted_count)
+    if archived_activations or evicted_count:
+        log(
+            producer,
+            f"Archived {len(archived_activations)} activation(s) of voters under the vote cap, "
+            f"removed {evicted_count} archived activation(s)"
+        )
 
 
 def get_voters_to_message(
+        producer: Producer,
         is_test: bool,
         is_dev: bool,
         is_active: bool,
         is_new_active: bool,
-        voters: [Wallet]
-) -> [Wallet]:
-    activations = get_activations()
-    voters_to_message: [Wallet] = []
+        voters: VoterColumns,
+        is_complete: bool
+) -> VoterColumns:
+    if not is_complete:
+        # acting on a partial voter list would skip voters and still record the activation
+        handle_error(None, "Incomplete voter list, no voters will be messaged", True)
+    activations, restored = load_activations(producer, voters)
+    with timed("selection"):
+        voters_to_message = select_voters_to_message(
+            voters, activations, producer.exclude_voters, is_active, is_new_active, MESSAGE_LIMIT_PER_VOTER
+        )
+    if not is_test or is_dev:
+        store_activations(producer, activations, voters, restored)
+        if is_voter_schedule_seeded(producer.username):
+            unseed_voter_schedule(producer.username)
+    return voters_to_message
 
-    for voter in voters:
-        if voter.address in EXCLUDE_VOTERS:
-            continue
-        if voter.address in activations:
-            activation_count = activations[voter.address]
-            activations[voter.address] = activation_count
-            if is_active:
-                if MESSAGE_LIMIT_PER_VOTER == -1 or activation_count < MESSAGE_LIMIT_PER_VOTER:
-                    activations[voter.address] = activation_count + 1
-                    voters_to_message.append(voter)
+
+def get_due_voters_to_message(
+        producer: Producer,
+        is_test: bool,
+        is_dev: bool,
+        voters: VoterColumns,
+        is_complete: bool
+) -> VoterColumns:
+    if not is_complete:
+        handle_error(None, "Incomplete voter list, no voters will be messaged", True)
+    persist = not is_test or is_dev
+    activations, restored = load_activations(producer, voters)
+    restored_dues: Dict[str, int] = {}
+    if is_voter_schedule_seeded(producer.username):
+        # voters back over the vote cap get the due time they had when they were archived, voters archived without
+        # one are spread over the next interval like at seeding
+        restored_dues = {
+            **spread_dues(restored, now, MESSAGE_INTERVAL_SECONDS), **get_archived_dues(producer.username, restored)
+        }
+        due_addresses = get_due_addresses(producer.username, now).union(
+            address for address, due in restored_dues.items() if due <= now
+        )
+    else:
+        # voters messaged under the single interval are spread over the next interval
+        dues = spread_dues(activations.keys(), now, MESSAGE_INTERVAL_SECONDS)
+        if persist:
+            seed_voter_schedule(producer.username, dues)
+            due_addresses = get_due_addresses(producer.username, now)
         else:
-            if is_active or is_new_active:
-                activations[voter.address] = 1
-                voters_to_message.append(voter)
-    if not is_test or is_dev:
-        set_activations(activations)
+            due_addresses = {address for address, due in dues.items() if due <= now}
+    with timed("selection"):
+        voters_to_message = select_due_voters(
+            voters, activations, due_addresses, producer.exclude_voters, MESSAGE_LIMIT_PER_VOTER
+        )
+    if persist:
+        store_activations(producer, activations, voters, restored)
+        # due voters over the vote cap that were not messaged, e.g. excluded, are checked again an interval later
+        # voters under the vote cap lose their due time until they are back over it
+        next_due = now + MESSAGE_INTERVAL_SECONDS
+        rescheduled = due_addresses.intersection(voters.addresses).union(voters_to_message.addresses)
+        set_voter_dues(producer.username, {**restored_dues, **dict.fromkeys(rescheduled, next_due)})
+        delete_voter_dues(producer.username, list(due_addresses.difference(rescheduled)))
     return voters_to_message
 
 
-def find_voting_for(username: str, voting_for: [VotingFor]) -> Optional[VotingFor]:
-    return next((vf for vf in voting_for if vf.username == username), None)
+def get_seconds_till_due(producer: Producer) -> int:
+    next_due = get_next_due(producer.username, now)
+    return MESSAGE_INTERVAL_SECONDS if next_due is None else next_due - now
 
 
-def get_voters_over_cap(username: str) -> [Wallet]:
+def prepare_sends(due_producers: [Producer]):
+    # looks up the node configuration and wallet nonces ahead, the send looks them up again when this fails
+    from transaction import prepare_transfers
     try:
-        voters = get_voters(username)
-        return [
-            voter for voter in voters
-            if (voting_for := find_voting_for(username, voter.voting_for)) is not None and voting_for.votes > VOTE_CAP
-        ]
+        prepare_transfers([wallet.mnemonic for producer in due_producers for wallet in producer.wallets])
+    except Exception as e:
+        handle_error(e, "Failed to prepare sending messages", False)
+
+
+def get_voters_over_cap(
+        producer: Producer,
+        height: Optional[int],
+        is_full_sync: bool,
+        persist: bool
+) -> (VoterColumns, bool):
+    # also returns whether the voter list is complete
+    username = producer.username
+    vote_cap = producer.vote_cap
+    try:
+        with timed("voters"):
+            if INCREMENTAL_SYNC_ENABLED:
+                voter_index = sync_voter_index(username, height, is_full_sync, persist)
+                return select_over_cap(columns_from_index(voter_index), vote_cap), True
+            voters = get_voters_over_cap_sorted(username, vote_cap) if API_SORTED_SCAN_ENABLED else None
+            if voters is not None:
+                return select_over_cap(columns_from_wallets(voters), vote_cap), True
+            if VOTER_SNAPSHOT_ENABLED:
+                voter_index, is_complete = get_voter_snapshot(username, height, persist)
+                return select_over_cap(columns_from_index(voter_index), vote_cap), is_complete
+            pagination = Pagination(f"/delegates/{username}/voters", API_PAGE_LIMIT)
+            voters = columns_from_wallets(
+                get_voters(username, keep=lambda voter: voter.votes > vote_cap, pagination=pagination)
+            )
+            return voters, pagination.complete
     except Exception as e:
         handle_error(e, f"Failed to get voters over cap for username {username}", True)
 
@@ -128,21 +294,27 @@ def is_messenger_new_active(seconds_till_activation: int) -> bool:
 def is_messenger_active(last_activation: int) -> (bool, int):
     active = now - last_activation > MESSAGE_INTERVAL_SECONDS
     seconds_till_activation = 0 if last_activation == 0 else MESSAGE_INTERVAL_SECONDS - (now - last_activation)
-    if active:
-        set_last_activation_timestamp(now)
     return active, seconds_till_activation
 
 
-def validate_peers_sync(height: int, peers: [Peer]) -> (bool, Dict[int, int]):
-    height_map: Dict[int, int] = {}
-    for peer in peers:
-        if peer.height in height_map:
-            height_map[peer.height] += 1
-        else:
-            height_map[peer.height] = 1
-    height_map = {
-        k: v for k, v in sorted(height_map.items(), key=lambda item: item[1], reverse=True)
-    }
+def get_peers_heights() -> Counter:
+    # stops reading peers once enough of them agree on a height
+    peers_heights: Counter = Counter()
+    with timed("peers"):
+        for peer in iter_peers():
+            peers_heights[peer.height] += 1
+            agreeing_count = sum(
+                peers_heights[height] for height in range(
+                    peer.height - SYNC_CHECK_BLOCK_THRESHOLD, peer.height + SYNC_CHECK_BLOCK_THRESHOLD + 1
+                )
+            )
+            if agreeing_count >= SYNC_CHECK_PEERS_QUORUM:
+                break
+    return peers_heights
+
+
+def validate_peers_sync(height: int, peers_heights: Counter) -> (bool, Dict[int, int]):
+    height_map = dict(peers_heights.most_common())
     if not height_map:
         return False, height_map
     common_height = next(iter(height_map))
@@ -152,27 +324,42 @@ def validate_peers_sync(height: int, peers: [Peer]) -> (bool, Dict[int, int]):
         return False, height_map
 
 
-def verify_node_status():
+def fetch_node_status() -> NodeStatus:
+    try:
+        return get_node_status()
+    except Exception as e:
+        handle_error(e, "Failed to get node status", True)
+
+
+def is_node_status_verified() -> bool:
+    return verified_node_status is not None and now - verified_node_status_time < SYNC_CHECK_CACHE_SECONDS
+
+
+def verify_node_status(node_status: Optional[NodeStatus]) -> NodeStatus:
+    # the status of this run is checked against the peers, a passed check is reused for SYNC_CHECK_CACHE_SECONDS
+    global verified_node_status, verified_node_status_time
+    if is_node_status_verified():
+        return verified_node_status
     try:
-        node_status = get_node_status()
-        is_status_synced = node_status.synced
         block_height = node_status.now
         blocks_count = node_status.blocks_count
-        if not is_status_synced:
+        if not node_status.synced:
             raise Exception(
                 f"Node unavailable or out of sync [status] height:{block_height} blocks_count:{blocks_count}"
             )
-        peers = get_peers()
-        is_peers_synced, peers_heights = validate_peers_sync(block_height, peers)
+        is_peers_synced, peers_heights = validate_peers_sync(block_height, get_peers_heights())
         if not is_peers_synced:
             raise Exception(
                 f"Node unavailable or out of sync [peers] height:{block_height} blocks_count:{blocks_count} peers_heights:{peers_heights}"
             )
+        verified_node_status = node_status
+        verified_node_status_time = now
+        return node_status
     except Exception as e:
         handle_error(e, "Failed to verify node status", True)
 
 
-def set_new_activation_weekday(is_test: bool, last_activation: int, new_weekday: int):
+def set_new_activation_weekday(producer: Producer, is_test: bool, last_activation: int, new_weekday: int):
     if last_activation == 0:
         last_date = datetime.fromtimestamp(now - MESSAGE_INTERVAL_SECONDS)
     else:
@@ -186,13 +373,13 @@ def set_new_activation_weekday(is_test: bool, last_activation: int, new_weekday:
     new_timestamp = int(new_date.timestamp())
     new_weekday_str = new_date.strftime(WEEKDAY_FORMAT)
     if is_test:
-        print(f"""Test changed activation weekday to {new_weekday_str}""")
+        log(producer, f"""Test changed activation weekday to {new_weekday_str}""")
     else:
-        set_last_activation_timestamp(new_timestamp)
-        print(f"""Changed activation weekday to {new_weekday_str}""")
+        set_last_activation_timestamp(producer.username, new_timestamp)
+        log(producer, f"""Changed activation weekday to {new_weekday_str}""")
 
 
-def set_new_activation_time(is_test: bool, last_activation: int, new_time: time):
+def set_new_activation_time(producer: Producer, is_test: bool, last_activation: int, new_time: time):
     if last_activation == 0:
         last_date = datetime.fromtimestamp(now - MESSAGE_INTERVAL_SECONDS)
     else:
@@ -200,69 +387,199 @@ def set_new_activation_time(is_test: bool, last_activation: int, new_time: time)
     new_timestamp = int(datetime.combine(last_date, new_time).timestamp())
     new_time_str = new_time.strftime(TIME_FORMAT)
     if is_test:
-        print(f"""Test changed activation time to {new_time_str}""")
+        log(producer, f"""Test changed activation time to {new_time_str}""")
     else:
-        set_last_activation_timestamp(new_timestamp)
-        print(f"""Changed activation time to {new_time_str}""")
+        set_last_activation_timestamp(producer.username, new_timestamp)
+        log(producer, f"""Changed activation time to {new_time_str}""")
 
 
-def main():
-    is_test = args.test
-    is_dev = args.dev
-    new_time = args.settime
-    new_weekday = args.setweekday
-    last_activation = get_last_activation_timestamp()
-    if new_time is not None and new_weekday is not None:
-        set_new_activation_time(is_test, last_activation, new_time)
-        set_new_activation_weekday(is_test, last_activation, new_weekday)
-        return
-    if new_time is not None:
-        set_new_activation_time(is_test, last_activation, new_time)
-        return
-    if new_weekday is not None:
-        set_new_activation_weekday(is_test, last_activation, new_weekday)
-        return
-    verify_node_status()
-    is_active, seconds_till_activation = is_messenger_active(last_activation)
-    is_new_active = is_messenger_new_active(seconds_till_activation)
+def log_next_activation(producer: Producer, seconds_till_activation: int):
     next_date = datetime.fromtimestamp(now + seconds_till_activation)
     next_time_str = next_date.strftime(TIME_FORMAT)
     next_weekday_str = next_date.strftime(WEEKDAY_FORMAT)
-    if not is_active and not is_new_active:
-        print(
-            f"Next activation in {time_delta_formatted(seconds_till_activation)} on {next_weekday_str} at {next_time_str}"
+    log(
+        producer,
+        f"Next activation in {time_delta_formatted(seconds_till_activation)} on {next_weekday_str} at {next_time_str}"
+    )
+
+
+def run_producer(
+        producer: Producer,
+        is_test: bool,
+        is_dev: bool,
+        is_active: bool,
+        is_new_active: bool,
+        seconds_till_activation: int,
+        voters: VoterColumns,
+        is_complete: bool
+):
+    if VOTER_SCHEDULE_ENABLED:
+        voters_to_message = get_due_voters_to_message(producer, is_test, is_dev, voters, is_complete)
+    else:
+        voters_to_message = get_voters_to_message(
+            producer, is_test, is_dev, is_active, is_new_active, voters, is_complete
         )
-        return
-    voters = get_voters_over_cap(BLOCK_PRODUCER_USERNAME)
-    voters_to_message = get_voters_to_message(is_test, is_dev, is_active, is_new_active, voters)
-    if (not is_test or is_dev) and is_active:
-        set_last_activation_timestamp(now)
+        # like the activations, a plain test run does not store the activation, the next test run is active again
+        if (not is_test or is_dev) and is_active:
+            set_last_activation_timestamp(producer.username, now)
     voters_to_message_count = len(voters_to_message)
+    vote_cap_str = from_atomic_formatted(producer.vote_cap, 0)
     if voters_to_message_count == 0:
-        if is_active:
-            print(
-                f"No voters over the {from_atomic_formatted(VOTE_CAP, 0)} SXP vote cap for block producer {BLOCK_PRODUCER_USERNAME}"
-            )
+        if VOTER_SCHEDULE_ENABLED:
+            log_next_activation(producer, get_seconds_till_due(producer))
+        elif is_active:
+            log(producer, f"No voters over the {vote_cap_str} SXP vote cap for block producer {producer.username}")
         else:
-            print(
-                f"Next activation in {time_delta_formatted(seconds_till_activation)} on {next_weekday_str} at {next_time_str}"
-            )
+            log_next_activation(producer, seconds_till_activation)
         return
     if is_test:
         logging_messages = [
-            f"""- {voter.address} {from_atomic_formatted(vf.votes, 0) if (vf := find_voting_for(BLOCK_PRODUCER_USERNAME, voter.voting_for)) is not None else ""} SXP"""
-            for voter in voters_to_message
+            f"""- {address} {from_atomic_formatted(votes, 0)} SXP"""
+            for address, votes in zip(voters_to_message.addresses, voters_to_message.votes)
         ]
-        print(
-            f"Test message to {voters_to_message_count} voter(s) over the {from_atomic_formatted(VOTE_CAP, 0)} SXP vote cap:"
-        )
+        log(producer, f"Test message to {voters_to_message_count} voter(s) over the {vote_cap_str} SXP vote cap:")
         for logging_message in logging_messages:
-            print(logging_message)
+            log(producer, logging_message)
     else:
-        send_messages(voters_to_message)
-        print(
-            f"Sent message to {voters_to_message_count} voter(s) over the {from_atomic_formatted(VOTE_CAP, 0)} SXP vote cap"
+        failed_addresses = send_messages(producer, voters_to_message.addresses)
+        if failed_addresses and (not is_test or is_dev):
+            revert_activations(producer, failed_addresses)
+        log(
+            producer,
+            f"Sent message to {voters_to_message_count - len(failed_addresses)} voter(s) over the {vote_cap_str} SXP vote cap"
+        )
+
+
+def run(is_test: bool, is_dev: bool) -> int:
+    # returns the amount of seconds till the next activation of any producer
+    global now
+    now = int(datetime.now().timestamp())
+    failed_producers.clear()
+    seconds_till_next_activation = MESSAGE_INTERVAL_SECONDS
+    schedules: Dict[str, (bool, bool, int)] = {}
+    full_syncs: Dict[str, bool] = {}
+    for producer in producers:
+        if VOTER_SCHEDULE_ENABLED:
+            # every run checks for new voters and voters whose own due time passed, the voter index is updated
+            # incrementally in between and read in full once every interval
+            schedules[producer.username] = (False, False, 0)
+            full_syncs[producer.username] = \
+                now - get_last_full_sync_timestamp(producer.username) > MESSAGE_INTERVAL_SECONDS
+            continue
+        is_active, seconds_till_activation = is_messenger_active(get_last_activation_timestamp(producer.username))
+        is_new_active = is_messenger_new_active(seconds_till_activation)
+        seconds_till_next_activation = min(
+            seconds_till_next_activation, MESSAGE_INTERVAL_SECONDS if is_active else seconds_till_activation
         )
+        if is_active or is_new_active:
+            schedules[producer.username] = (is_active, is_new_active, seconds_till_activation)
+            full_syncs[producer.username] = is_active
+        else:
+            log_next_activation(producer, seconds_till_activation)
+    if not schedules:
+        return seconds_till_next_activation
+    due_producers = [producer for producer in producers if producer.username in schedules]
+    # one node status for all producers, it gives the height of the voter index and is checked against the peers
+    node_status = None
+    if INCREMENTAL_SYNC_ENABLED or VOTER_SNAPSHOT_ENABLED or SYNC_CHECK_ENABLED and not is_node_status_verified():
+        node_status = fetch_node_status()
+    height = node_status.now if INCREMENTAL_SYNC_ENABLED or VOTER_SNAPSHOT_ENABLED else None
+    # the peers check and the lookups for sending overlap with fetching the voters of all producers
+    with ThreadPoolExecutor(max_workers=min(len(due_producers), API_MAX_WORKERS) + 2) as executor:
+        node_check = executor.submit(verify_node_status, node_status) if SYNC_CHECK_ENABLED else None
+        if not is_test and any(schedules[producer.username][0] for producer in due_producers):
+            # only an activation messages every voter, other runs send seldom and look these up when they do
+            executor.submit(prepare_sends, due_producers)
+        voters_futures = {
+            producer.username: executor.submit(
+                get_voters_over_cap, producer, height, full_syncs[producer.username], not is_test or is_dev
+            )
+            for producer in due_producers
+        }
+    # nothing is stored or sent for a node that is out of sync
+    if node_check is not None:
+        node_check.result()
+    # messages are sent one producer at a time
+    for producer in due_producers:
+        is_active, is_new_active, seconds_till_activation = schedules[producer.username]
+        try:
+            with producer_transaction(producer.username):
+                voters, is_complete = voters_futures[producer.username].result()
+                run_producer(
+                    producer, is_test, is_dev, is_active, is_new_active, seconds_till_activation, voters, is_complete
+                )
+        except SystemExit:
+            # fatal errors are logged by handle_error, the changes of this producer are undone
+            failed_producers.append(producer.username)
+    if VOTER_SCHEDULE_ENABLED:
+        seconds_till_next_activation = min(get_seconds_till_due(producer) for producer in producers)
+    return seconds_till_next_activation
+
+
+def write_profile(profile: "cProfile.Profile"):
+    import pstats
+    file_name = f"logs/profile-{now}.prof"
+    profile.dump_stats(file_name)
+    print(f"Phases:\n{format_phases()}\n\nProfile written to {file_name}, slowest calls:")
+    pstats.Stats(profile).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(25)
+
+
+def run_measured(is_test: bool, is_dev: bool, is_profile: bool) -> int:
+    # one run in its own transaction, its phase metrics are written afterwards, also when the run fails
+    reset_metrics()
+    profile = None
+    if is_profile:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+    is_success = False
+    try:
+        with timed("run"), run_transaction():
+            seconds_till_activation = run(is_test, is_dev)
+        if failed_producers:
+            # the other producers are stored, the run still exits with an error
+            handle_error(None, f"Failed block producer(s): {', '.join(failed_producers)}", True)
+        is_success = True
+        return seconds_till_activation
+    finally:
+        if profile is not None:
+            profile.disable()
+            write_profile(profile)
+        write_metrics(is_success)
+
+
+def run_daemon(is_test: bool, is_dev: bool, is_profile: bool):
+    # keeps the process, its http sessions and cached node configuration alive between runs
+    while True:
+        try:
+            seconds_till_activation = run_measured(is_test, is_dev, is_profile)
+        except SystemExit:
+            # fatal errors are logged by handle_error, the next poll tries again
+            seconds_till_activation = DAEMON_POLL_INTERVAL_SECONDS
+        except Exception as e:
+            handle_error(e, "Daemon run failure", False)
+            seconds_till_activation = DAEMON_POLL_INTERVAL_SECONDS
+        sleep(max(1, min(DAEMON_POLL_INTERVAL_SECONDS, seconds_till_activation)))
+
+
+def main():
+    args = parser.parse_args()
+    is_test = args.test
+    is_dev = args.dev
+    new_time = args.settime
+    new_weekday = args.setweekday
+    if new_time is not None or new_weekday is not None:
+        for producer in producers:
+            last_activation = get_last_activation_timestamp(producer.username)
+            if new_time is not None:
+                set_new_activation_time(producer, is_test, last_activation, new_time)
+            if new_weekday is not None:
+                set_new_activation_weekday(producer, is_test, last_activation, new_weekday)
+        return
+    if args.daemon:
+        run_daemon(is_test, is_dev, args.profile)
+        return
+    run_measured(is_test, is_dev, args.profile)
 
 
 if __name__ == "__main__":
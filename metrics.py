@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from config import METRICS_LOG_FILE, METRICS_PROMETHEUS_FILE
+from serialization import dumps
+
+PROMETHEUS_PREFIX = "vote_cap_messenger"
+
+
+class PhaseStats(object):
+    __slots__ = ("count", "seconds", "bytes")
+
+    def __init__(self):
+        self.count: int = 0
+        self.seconds: float = 0
+        self.bytes: int = 0
+
+
+# phases and counters of the current run, pages are recorded from several threads
+phases: Dict[str, PhaseStats] = {}
+counters: Dict[str, int] = {}
+lock = threading.Lock()
+
+
+def record(phase: str, seconds: float, size: int = 0):
+    with lock:
+        if phase not in phases:
+            phases[phase] = PhaseStats()
+        stats = phases[phase]
+        stats.count += 1
+        stats.seconds += seconds
+        stats.bytes += size
+
+
+def increment(counter: str, amount: int = 1):
+    with lock:
+        counters[counter] = counters.get(counter, 0) + amount
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def reset():
+    with lock:
+        phases.clear()
+        counters.clear()
+
+
+def get_counters() -> Dict[str, int]:
+    with lock:
+        return dict(counters)
+
+
+def get_phases() -> Dict[str, Dict]:
+    with lock:
+        return {
+            phase: {"count": stats.count, "seconds": round(stats.seconds, 6), "bytes": stats.bytes}
+            for phase, stats in phases.items()
+        }
+
+
+def format_phases() -> str:
+    return "\n".join(
+        f"{phase:<16} {stats['count']:>6}x {stats['seconds']:10.3f}s {stats['bytes']:>12} bytes"
+        for phase, stats in get_phases().items()
+    )
+
+
+def format_prometheus(timestamp: int, run_phases: Dict[str, Dict], run_counters: Dict[str, int]) -> str:
+    lines = []
+    for name, key, help_text in [
+        ("phase_seconds", "seconds", "Wall time spent per phase in the last run, summed over concurrent work"),
+        ("phase_count", "count", "Amount of times a phase ran in the last run"),
+        ("phase_bytes", "bytes", "Amount of response bytes received per phase in the last run"),
+    ]:
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} gauge")
+        lines.extend(
+            f"{PROMETHEUS_PREFIX}_{name}{{phase=\"{phase}\"}} {stats[key]}" for phase, stats in run_phases.items()
+        )
+    for counter, value in run_counters.items():
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{counter} gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}_{counter} {value}")
+    lines.append(f"# HELP {PROMETHEUS_PREFIX}_last_run_timestamp_seconds Time the last run finished")
+    lines.append(f"# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge")
+    lines.append(f"{PROMETHEUS_PREFIX}_last_run_timestamp_seconds {timestamp}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(is_success: bool):
+    # one json line per run, the prometheus file only holds the last run, e.g. for the node exporter textfile collector
+    if METRICS_LOG_FILE is None and METRICS_PROMETHEUS_FILE is None:
+        return
+    timestamp = int(time.time())
+    run_phases = get_phases()
+    run_counters = get_counters()
+    if METRICS_LOG_FILE is not None:
+        with open(METRICS_LOG_FILE, "a") as outfile:
+            outfile.write(
+                dumps({"timestamp": timestamp, "success": is_success, "phases": run_phases, "counters": run_counters})
+                + "\n"
+            )
+    if METRICS_PROMETHEUS_FILE is not None:
+        # replaced at once so a scrape never reads a half written file
+        temporary_file_name = METRICS_PROMETHEUS_FILE + ".tmp"
+        with open(temporary_file_name, "w") as outfile:
+            outfile.write(format_prometheus(timestamp, run_phases, run_counters))
+        os.replace(temporary_file_name, METRICS_PROMETHEUS_FILE)
@@ -0,0 +1,49 @@
+from typing import Dict, Optional, Set
+
+from config import PRODUCERS, WALLET_MNEMONIC, WALLET_SECOND_MNEMONIC, SENDER_WALLETS, VOTE_CAP, MESSAGE, \
+    EXCLUDE_VOTERS
+
+
+class SenderWallet(object):
+    def __init__(self, mnemonic: str, second_mnemonic: Optional[str]):
+        self.mnemonic: str = mnemonic
+        self.second_mnemonic: Optional[str] = second_mnemonic
+
+
+class Producer(object):
+    def __init__(
+            self,
+            username: str,
+            wallets: [SenderWallet],
+            vote_cap: int,
+            message: str,
+            exclude_voters: Set[str]
+    ):
+        self.username: str = username
+        # the messages are spread over all wallets, the first one is the main wallet
+        self.wallets: [SenderWallet] = wallets
+        self.vote_cap: int = vote_cap
+        self.message: str = message
+        self.exclude_voters: Set[str] = exclude_voters
+
+
+def parse_sender_wallet(data: Dict) -> SenderWallet:
+    return SenderWallet(mnemonic=data.get("mnemonic"), second_mnemonic=data.get("second_mnemonic"))
+
+
+def parse_producer(data: Dict) -> Producer:
+    # values that are left out fall back to the single producer values in config.py
+    wallet = SenderWallet(
+        mnemonic=data.get("wallet_mnemonic", WALLET_MNEMONIC),
+        second_mnemonic=data.get("wallet_second_mnemonic", WALLET_SECOND_MNEMONIC)
+    )
+    return Producer(
+        username=data["username"],
+        wallets=[wallet] + [parse_sender_wallet(entry) for entry in data.get("sender_wallets", SENDER_WALLETS)],
+        vote_cap=data.get("vote_cap", VOTE_CAP),
+        message=data.get("message", MESSAGE),
+        exclude_voters=set(data.get("exclude_voters", EXCLUDE_VOTERS))
+    )
+
+
+producers: [Producer] = [parse_producer(producer) for producer in PRODUCERS]
@@ -0,0 +1,99 @@
+import zlib
+from array import array
+from itertools import compress, repeat
+from operator import gt, lt, eq
+from typing import Dict, Iterable, List, Set
+
+from core_api import Wallet
+
+
+class VoterColumns(object):
+    # voters of one block producer as columns, a voter has the same position in every column
+    __slots__ = ("addresses", "votes")
+
+    def __init__(self, addresses: [str], votes: array):
+        self.addresses: [str] = addresses
+        self.votes: array = votes
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def select(self, mask: Iterable[bool]) -> "VoterColumns":
+        mask = list(mask)
+        return VoterColumns(list(compress(self.addresses, mask)), array("q", compress(self.votes, mask)))
+
+
+def columns_from_index(voter_index: Dict[str, int]) -> VoterColumns:
+    return VoterColumns(list(voter_index.keys()), array("q", voter_index.values()))
+
+
+def columns_from_wallets(wallets: Iterable[Wallet]) -> VoterColumns:
+    addresses: [str] = []
+    votes = array("q")
+    for wallet in wallets:
+        addresses.append(wallet.address)
+        votes.append(wallet.votes)
+    return VoterColumns(addresses, votes)
+
+
+def select_over_cap(voters: VoterColumns, vote_cap: int) -> VoterColumns:
+    return voters.select(map(gt, voters.votes, repeat(vote_cap)))
+
+
+def select_and_count(
+        voters: VoterColumns,
+        activations: Dict[str, int],
+        counts: List[int],
+        mask: List[bool],
+        exclude_voters: Set[str]
+) -> VoterColumns:
+    # the activation counts of the selected voters are raised in place
+    if exclude_voters:
+        # for booleans, selected > excluded is selected and not excluded
+        mask = list(map(gt, mask, map(exclude_voters.__contains__, voters.addresses)))
+    selected = voters.select(mask)
+    activations.update(zip(selected.addresses, map(int.__add__, compress(counts, mask), repeat(1))))
+    return selected
+
+
+def select_voters_to_message(
+        voters: VoterColumns,
+        activations: Dict[str, int],
+        exclude_voters: Set[str],
+        is_active: bool,
+        is_new_active: bool,
+        message_limit: int
+) -> VoterColumns:
+    # new voters get a first message when active or new active, known voters a next one when active and under the limit
+    counts = list(map(activations.get, voters.addresses, repeat(0)))
+    if is_active and message_limit == -1:
+        mask = [True] * len(voters)
+    elif is_active:
+        mask = list(map(lt, counts, repeat(message_limit)))
+    elif is_new_active:
+        mask = list(map(eq, counts, repeat(0)))
+    else:
+        mask = [False] * len(voters)
+    return select_and_count(voters, activations, counts, mask, exclude_voters)
+
+
+def select_due_voters(
+        voters: VoterColumns,
+        activations: Dict[str, int],
+        due_addresses: Set[str],
+        exclude_voters: Set[str],
+        message_limit: int
+) -> VoterColumns:
+    # new voters get a first message right away, known voters a next one when their own due time passed
+    counts = list(map(activations.get, voters.addresses, repeat(0)))
+    is_due = map(due_addresses.__contains__, voters.addresses)
+    if message_limit == -1:
+        mask = [count == 0 or due for count, due in zip(counts, is_due)]
+    else:
+        mask = [count == 0 or due and count < message_limit for count, due in zip(counts, is_due)]
+    return select_and_count(voters, activations, counts, mask, exclude_voters)
+
+
+def spread_dues(addresses: Iterable[str], timestamp: int, interval: int) -> Dict[str, int]:
+    # the same address always lands on the same offset, which spreads voters evenly over the interval
+    return {address: timestamp + zlib.crc32(address.encode()) % interval for address in addresses}
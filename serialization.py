@@ -0,0 +1,78 @@
+import json
+from typing import Any, Callable, Dict, Optional, Union, IO
+
+from config import JSON_BACKEND
+
+
+class JsonBackend(object):
+    def __init__(
+            self,
+            name: str,
+            loads: Callable[[Union[str, bytes]], Any],
+            dumps: Callable[[Any, Optional[Callable[[Any], Any]]], str],
+            fast: bool
+    ):
+        self.name: str = name
+        self.loads: Callable[[Union[str, bytes]], Any] = loads
+        self.dumps: Callable[[Any, Optional[Callable[[Any], Any]]], str] = dumps
+        self.fast: bool = fast
+
+
+def load_backends() -> Dict[str, JsonBackend]:
+    # ordered from fastest to slowest, only installed backends are included
+    backends: Dict[str, JsonBackend] = {}
+    try:
+        import orjson
+        backends["orjson"] = JsonBackend(
+            "orjson",
+            orjson.loads,
+            lambda value, default=None: orjson.dumps(value, default=default).decode(),
+            True
+        )
+    except ImportError:
+        pass
+    try:
+        import ujson
+        backends["ujson"] = JsonBackend(
+            "ujson",
+            ujson.loads,
+            lambda value, default=None: ujson.dumps(value, default=default),
+            True
+        )
+    except ImportError:
+        pass
+    backends["json"] = JsonBackend(
+        "json",
+        json.loads,
+        lambda value, default=None: json.dumps(value, default=default),
+        False
+    )
+    return backends
+
+
+def select_backend(name: str) -> JsonBackend:
+    if name == "auto":
+        return next(iter(backends.values()))
+    if name not in backends:
+        raise Exception(f"JSON backend '{name}' is not installed")
+    return backends[name]
+
+
+backends = load_backends()
+backend = select_backend(JSON_BACKEND)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    return backend.loads(data)
+
+
+def dumps(value: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    return backend.dumps(value, default)
+
+
+def load(file: IO) -> Any:
+    return backend.loads(file.read())
+
+
+def dump(value: Any, file: IO, default: Optional[Callable[[Any], Any]] = None):
+    file.write(backend.dumps(value, default))
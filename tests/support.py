@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+from typing import List, Dict
+from unittest import mock
+
+import core_api
+import data
+from benchmarks.stub_node import StubNode
+from endpoints import EndpointPool
+
+
+def use_temporary_data(test_case: unittest.TestCase):
+    # every test gets its own data.db in a temporary working directory
+    directory = tempfile.TemporaryDirectory()
+    previous_directory = os.getcwd()
+    os.chdir(directory.name)
+    data.connection = None
+    data.stored_activations.clear()
+    data.stored_voter_index.clear()
+
+    def restore():
+        if data.connection is not None:
+            data.connection.close()
+            data.connection = None
+        os.chdir(previous_directory)
+        directory.cleanup()
+
+    test_case.addCleanup(restore)
+
+
+def start_stub_node(test_case: unittest.TestCase, username: str, voters: List[Dict], **kwargs) -> StubNode:
+    node = StubNode(username, voters, 0, **kwargs)
+    node.start()
+    test_case.addCleanup(node.stop)
+    return node
+
+
+def use_endpoints(test_case: unittest.TestCase, base_urls: [str], *modules) -> EndpointPool:
+    # api reads of core_api and of the given modules go to the base urls for the duration of the test
+    endpoint_pool = EndpointPool(base_urls)
+    for module in (core_api, *modules):
+        patcher = mock.patch.object(module, "endpoint_pool", endpoint_pool)
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+    return endpoint_pool
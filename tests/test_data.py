@@ -0,0 +1,50 @@
+import io
+import os
+import unittest
+from unittest import mock
+
+import data
+import error
+from producers import producers
+from support import use_temporary_data
+
+
+class DataFileTest(unittest.TestCase):
+    def setUp(self):
+        use_temporary_data(self)
+        self.username = producers[0].username
+
+    def write_data_file(self, content: str):
+        with open(data.DATA_FILE_NAME, "w") as outfile:
+            outfile.write(content)
+
+    def test_migrates_the_data_file(self):
+        self.write_data_file('{"last_activation_timestamp": 1700000000, "activations": {"a": 2}}')
+        self.assertEqual(data.get_last_activation_timestamp(self.username), 1700000000)
+        self.assertEqual(data.get_activations(self.username), {"a": 2})
+        self.assertTrue(os.path.exists(data.DATA_FILE_NAME + ".migrated"))
+
+    def test_unreadable_data_file_is_set_aside(self):
+        for content in ["", '{"activations": ']:
+            with self.subTest(content=content):
+                if data.connection is not None:
+                    data.connection.close()
+                    data.connection = None
+                self.write_data_file(content)
+                with mock.patch.object(error, "error_log", io.StringIO()) as error_log, \
+                        mock.patch("sys.stdout", io.StringIO()):
+                    self.assertEqual(data.get_last_activation_timestamp(self.username), 0)
+                self.assertIn("Failed to read data.json", error_log.getvalue())
+                self.assertFalse(os.path.exists(data.DATA_FILE_NAME))
+                self.assertTrue(os.path.exists(data.DATA_FILE_NAME + ".corrupt"))
+
+    def test_failed_migration_is_tried_again(self):
+        self.write_data_file('{"activations": {"a": 2}}')
+        with mock.patch.object(data, "migrate_data_file", side_effect=Exception("migration failed")):
+            self.assertRaises(Exception, data.get_connection)
+        self.assertIsNone(data.connection)
+        self.assertEqual(data.get_activations(self.username), {"a": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
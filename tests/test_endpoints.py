@@ -0,0 +1,62 @@
+import time
+import unittest
+from unittest import mock
+
+import core_api
+import transaction
+from support import use_temporary_data, start_stub_node, use_endpoints
+
+
+class EndpointsTest(unittest.TestCase):
+    def setUp(self):
+        use_temporary_data(self)
+
+    def test_fails_over_to_the_next_endpoint(self):
+        failing_node = start_stub_node(self, "stub", [])
+        failing_node.failing = True
+        node = start_stub_node(self, "stub", [])
+        endpoint_pool = use_endpoints(self, [failing_node.base_url, node.base_url])
+        self.assertEqual(core_api.get_node_status().now, core_api.get_node_status().now)
+        # the failing endpoint is asked once, then skipped during its cooldown
+        self.assertEqual(failing_node.request_count, 1)
+        self.assertEqual(node.request_count, 2)
+        self.assertEqual(endpoint_pool.ranked()[0].base_url, node.base_url)
+
+    def test_prefers_the_fastest_endpoint(self):
+        slow_node = start_stub_node(self, "stub", [])
+        slow_node.latency_seconds = 0.1
+        fast_node = start_stub_node(self, "stub", [])
+        endpoint_pool = use_endpoints(self, [slow_node.base_url, fast_node.base_url])
+        for _ in range(5):
+            core_api.get_node_status()
+        # both endpoints are measured once, the remaining reads go to the fast one
+        self.assertEqual(slow_node.request_count, 1)
+        self.assertEqual(fast_node.request_count, 4)
+        self.assertEqual(endpoint_pool.ranked()[0].base_url, fast_node.base_url)
+
+    def test_hedges_slow_requests(self):
+        slow_node = start_stub_node(self, "stub", [])
+        slow_node.latency_seconds = 1
+        fast_node = start_stub_node(self, "stub", [])
+        use_endpoints(self, [slow_node.base_url, fast_node.base_url])
+        with mock.patch.object(core_api, "API_HEDGE_AFTER_SECONDS", 0.05):
+            start = time.perf_counter()
+            core_api.get_node_status()
+            seconds = time.perf_counter() - start
+        self.assertLess(seconds, slow_node.latency_seconds)
+        self.assertEqual(fast_node.request_count, 1)
+
+    def test_broadcasts_to_several_endpoints(self):
+        failing_node = start_stub_node(self, "stub", [])
+        failing_node.failing = True
+        node = start_stub_node(self, "stub", [])
+        use_endpoints(self, [failing_node.base_url, node.base_url], transaction)
+        with mock.patch.object(transaction, "API_BROADCAST_ENDPOINTS", 2):
+            response = transaction.create_transactions([{"id": "transaction"}])
+        self.assertEqual(response["data"]["accept"], ["transaction"])
+        self.assertEqual(failing_node.request_count, 1)
+        self.assertEqual(node.transaction_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
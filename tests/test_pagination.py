@@ -0,0 +1,59 @@
+import io
+import unittest
+from unittest import mock
+
+import api
+import data
+import error
+import messenger
+from benchmarks.synthetic import make_voter_entries
+from config import ATOMIC, API_RETRIES
+from producers import Producer, SenderWallet
+from support import use_temporary_data, start_stub_node, use_endpoints
+
+USERNAME = "stub"
+VOTER_COUNT = 500
+VOTE_CAP = 40_000 * ATOMIC
+
+
+class PaginationTest(unittest.TestCase):
+    def setUp(self):
+        use_temporary_data(self)
+        voters = make_voter_entries(VOTER_COUNT, USERNAME)
+        self.over_cap = {
+            voter["address"] for voter in voters if int(voter["votingFor"][USERNAME]["votes"]) > VOTE_CAP
+        }
+        self.node = start_stub_node(self, USERNAME, voters)
+        use_endpoints(self, [self.node.base_url])
+        self.producer = Producer(USERNAME, [SenderWallet("mnemonic", None)], VOTE_CAP, "message", set())
+        for patcher in [
+            mock.patch.object(api, "API_RETRY_BACKOFF_SECONDS", 0),
+            mock.patch.object(messenger, "INCREMENTAL_SYNC_ENABLED", False),
+            mock.patch.object(messenger, "VOTER_SNAPSHOT_ENABLED", False),
+            mock.patch.object(messenger, "API_SORTED_SCAN_ENABLED", False),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_page_recovers_after_a_retry(self):
+        self.node.page_failures = {3: API_RETRIES}
+        voters, is_complete = messenger.get_voters_over_cap(self.producer, None, False, False)
+        self.assertTrue(is_complete)
+        self.assertEqual(set(voters.addresses), self.over_cap)
+        self.assertEqual(self.node.page_failures, {3: 0})
+
+    def test_failed_page_stops_before_activations_change(self):
+        data.set_activations(USERNAME, {"a": 1})
+        self.node.page_failures = {3: API_RETRIES + 1}
+        voters, is_complete = messenger.get_voters_over_cap(self.producer, None, False, False)
+        self.assertFalse(is_complete)
+        with mock.patch.object(error, "error_log", io.StringIO()) as error_log, \
+                mock.patch("sys.stdout", io.StringIO()), self.assertRaises(SystemExit):
+            messenger.get_voters_to_message(self.producer, False, False, True, False, voters, is_complete)
+        self.assertIn("Incomplete voter list", error_log.getvalue())
+        self.assertEqual(data.get_activations(USERNAME), {"a": 1})
+        self.assertEqual(data.get_archived_activations(USERNAME, ["a"]), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import unittest
+from unittest import mock
+
+import data
+import error
+import messenger
+from benchmarks.synthetic import make_voter_entries
+from config import ATOMIC
+from producers import Producer, SenderWallet
+from support import use_temporary_data, start_stub_node, use_endpoints
+
+USERNAME = "stub"
+VOTE_CAP = 40_000 * ATOMIC
+
+
+class RunTest(unittest.TestCase):
+    def setUp(self):
+        use_temporary_data(self)
+        self.node = start_stub_node(self, USERNAME, make_voter_entries(200, USERNAME))
+        use_endpoints(self, [self.node.base_url])
+        producer = Producer(USERNAME, [SenderWallet("mnemonic", None)], VOTE_CAP, "message", set())
+        for patcher in [
+            mock.patch.object(messenger, "producers", [producer]),
+            mock.patch.object(messenger, "verified_node_status", None),
+            mock.patch.object(error, "error_log", io.StringIO()),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_one_node_status_request(self):
+        with mock.patch("sys.stdout", io.StringIO()), data.run_transaction():
+            messenger.run(True, True)
+        self.assertEqual(self.node.status_count, 1)
+
+    def test_failed_producer_fails_the_run(self):
+        producers = [
+            Producer(username, [SenderWallet("mnemonic", None)], VOTE_CAP, "message", set())
+            for username in ["first", "second"]
+        ]
+
+        def run_producer(producer: Producer, *args):
+            data.set_last_activation_timestamp(producer.username, messenger.now)
+            if producer.username == "first":
+                quit(code=1)
+
+        with mock.patch.object(messenger, "producers", producers), \
+                mock.patch.object(messenger, "get_voters_over_cap", return_value=(None, True)), \
+                mock.patch.object(messenger, "run_producer", run_producer), \
+                mock.patch.object(messenger, "write_metrics") as write_metrics, \
+                mock.patch("sys.stdout", io.StringIO()) as output, \
+                self.assertRaises(SystemExit) as context:
+            messenger.run_measured(False, False, False)
+        self.assertEqual(context.exception.code, 1)
+        write_metrics.assert_called_once_with(False)
+        self.assertIn("Failed block producer(s): first\n", output.getvalue())
+        # the changes of the failed producer are undone, the other producer is stored
+        self.assertEqual(data.get_last_activation_timestamp("first"), 0)
+        self.assertEqual(data.get_last_activation_timestamp("second"), messenger.now)
+
+    def test_unavailable_node_is_handled(self):
+        self.node.failing = True
+        with mock.patch("sys.stdout", io.StringIO()) as output, self.assertRaises(SystemExit), data.run_transaction():
+            messenger.run(True, True)
+        self.assertIn("Failed to get node status", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
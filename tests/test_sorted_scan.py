@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+
+import core_api
+import messenger
+from benchmarks.stub_node import StubNode
+from benchmarks.synthetic import make_voter_entries
+from config import ATOMIC
+from endpoints import EndpointPool
+from producers import Producer, SenderWallet
+
+USERNAME = "stub"
+VOTER_COUNT = 1_000
+VOTE_CAP = 40_000 * ATOMIC
+
+
+def get_votes(voter) -> int:
+    return int(voter["votingFor"][USERNAME]["votes"])
+
+
+class SortedScanTest(unittest.TestCase):
+    def setUp(self):
+        self.voters = make_voter_entries(VOTER_COUNT, USERNAME)
+        self.over_cap = {voter["address"] for voter in self.voters if get_votes(voter) > VOTE_CAP}
+        self.endpoint_pool = core_api.endpoint_pool
+
+    def tearDown(self):
+        core_api.endpoint_pool = self.endpoint_pool
+
+    def start_node(self, sorting: str) -> StubNode:
+        node = StubNode(USERNAME, self.voters, 0, sorting)
+        node.start()
+        self.addCleanup(node.stop)
+        core_api.endpoint_pool = EndpointPool([node.base_url])
+        return node
+
+    def test_stops_at_first_page_under_the_cap(self):
+        node = self.start_node("supported")
+        voters = core_api.get_voters_over_cap_sorted(USERNAME, VOTE_CAP)
+        self.assertEqual({voter.address for voter in voters}, self.over_cap)
+        # the over cap voters fit in the first pages, the remaining pages are never requested
+        page_count = -(-len(self.over_cap) // core_api.API_PAGE_LIMIT)
+        self.assertEqual(len(node.voter_requests), page_count)
+        self.assertLess(page_count, VOTER_COUNT // core_api.API_PAGE_LIMIT)
+
+    def test_detects_unsorted_pages(self):
+        node = self.start_node("ignored")
+        order_by, key = next(iter(core_api.VOTERS_SORT_ORDERS.items()))
+        self.assertIsNone(core_api.get_voters_sorted(USERNAME, order_by, key, VOTE_CAP))
+        # unsorted data is noticed on the first page
+        self.assertEqual(len(node.voter_requests), 1)
+
+    def test_rejected_ordering(self):
+        self.start_node("rejected")
+        self.assertIsNone(core_api.get_voters_over_cap_sorted(USERNAME, VOTE_CAP))
+
+    def test_falls_back_to_the_full_scan(self):
+        for sorting in ["ignored", "rejected"]:
+            with self.subTest(sorting=sorting):
+                node = self.start_node(sorting)
+                producer = Producer(USERNAME, [SenderWallet("mnemonic", None)], VOTE_CAP, "message", set())
+                with mock.patch.object(messenger, "INCREMENTAL_SYNC_ENABLED", False), \
+                        mock.patch.object(messenger, "VOTER_SNAPSHOT_ENABLED", False):
+                    voters, is_complete = messenger.get_voters_over_cap(producer, None, False, False)
+                self.assertTrue(is_complete)
+                self.assertEqual(set(voters.addresses), self.over_cap)
+                full_scan_requests = [query for query in node.voter_requests if "orderBy" not in query]
+                self.assertEqual(len(full_scan_requests), VOTER_COUNT // core_api.API_PAGE_LIMIT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from unittest import mock
+
+import transaction
+from benchmarks.synthetic import make_valid_address
+from data import get_last_nonce, delete_cached
+from support import use_temporary_data, start_stub_node, use_endpoints
+
+MNEMONIC = "transfer batch test mnemonic"
+
+
+class TransferBatchTest(unittest.TestCase):
+    def setUp(self):
+        use_temporary_data(self)
+        transaction.nonce_managers.clear()
+        transaction.get_dynamic_fee.cache_clear()
+        self.node = start_stub_node(self, "stub", [])
+        use_endpoints(self, [self.node.base_url], transaction)
+        # one transaction per broadcast, the stub node holds 40 recipients per transaction
+        patcher = mock.patch.object(transaction, "BROADCAST_MAX_TRANSACTIONS", 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        payments = [transaction.Payment(make_valid_address(index), 1) for index in range(100)]
+        self.chunks = transaction.chunk_payments(payments, transaction.get_transfer_max_recipients())
+
+    def test_all_accepted(self):
+        results = transaction.transfer_batch(self.chunks, "memo", MNEMONIC, None)
+        self.assertEqual([result.nonce for result in results], [1, 2, 3])
+        self.assertTrue(all(result.accepted for result in results))
+        self.assertEqual(get_last_nonce(transaction.get_wallet_address(MNEMONIC)), 3)
+
+    def test_failed_broadcast_keeps_accepted_chunks(self):
+        self.node.broadcast_limit = 1
+        results = transaction.transfer_batch(self.chunks, "memo", MNEMONIC, None)
+        self.assertEqual([result.accepted for result in results], [True, False, False])
+        self.assertEqual([result.payments for result in results], self.chunks)
+        self.assertEqual(results[0].nonce, 1)
+        self.assertEqual(get_last_nonce(transaction.get_wallet_address(MNEMONIC)), 1)
+        # the retry only resends the chunks that were not accepted
+        self.assertEqual(self.node.transaction_count, 1)
+
+    def test_fees_follow_a_new_node_configuration(self):
+        fee = transaction.get_dynamic_fee(40, "memo", False)
+        self.node.configuration["pool"]["dynamicFees"]["minFeePool"] *= 2
+        # the cached configuration expired
+        delete_cached(transaction.NODE_CONFIGURATION_CACHE_KEY)
+        transaction.get_cached_dynamic_fees_config()
+        self.assertEqual(transaction.get_dynamic_fee(40, "memo", False), 2 * fee)
+
+
+if __name__ == "__main__":
+    unittest.main()
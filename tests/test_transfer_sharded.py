@@ -0,0 +1,60 @@
+import unittest
+from collections import Counter
+from unittest import mock
+
+from solar_crypto.identity.public_key import PublicKey
+
+import transaction
+from benchmarks.synthetic import make_valid_address
+from producers import SenderWallet
+from support import use_temporary_data, start_stub_node, use_endpoints
+
+MEMO = "memo"
+WALLETS = [SenderWallet(f"sharded test mnemonic {index}", None) for index in range(3)]
+
+
+class TransferShardedTest(unittest.TestCase):
+    def setUp(self):
+        use_temporary_data(self)
+        transaction.nonce_managers.clear()
+        transaction.get_dynamic_fee.cache_clear()
+        self.node = start_stub_node(self, "stub", [])
+        use_endpoints(self, [self.node.base_url], transaction)
+        patcher = mock.patch.object(transaction, "BROADCAST_MAX_TRANSACTIONS", 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # 5 transactions of 40 recipients
+        self.payments = [transaction.Payment(make_valid_address(index), 1) for index in range(200)]
+        self.addresses = [transaction.get_wallet_address(wallet.mnemonic) for wallet in WALLETS]
+        chunks = transaction.chunk_payments(self.payments, transaction.get_transfer_max_recipients())
+        self.chunk_cost = transaction.get_transfer_cost(chunks[0], MEMO, WALLETS[0])
+
+    def count_by_sender(self, results: [transaction.ChunkResult], accepted: bool) -> Counter:
+        return Counter(result.sender for result in results if result.accepted == accepted)
+
+    def test_chunks_follow_the_balances(self):
+        # the second wallet pays for one transaction, the third for none
+        self.node.balances = {self.addresses[1]: self.chunk_cost, self.addresses[2]: 0}
+        results = transaction.transfer_sharded(self.payments, MEMO, WALLETS)
+        self.assertEqual(self.count_by_sender(results, True), {self.addresses[0]: 4, self.addresses[1]: 1})
+        recipients = [payment.recipient for result in results for payment in result.payments]
+        self.assertEqual(sorted(recipients), sorted(payment.recipient for payment in self.payments))
+
+    def test_insufficient_balance(self):
+        self.node.balances = {address: self.chunk_cost for address in self.addresses}
+        with self.assertRaisesRegex(Exception, "insufficient balance"):
+            transaction.transfer_sharded(self.payments, MEMO, WALLETS)
+        self.assertEqual(self.node.broadcast_count, 0)
+
+    def test_failing_wallet_only_fails_its_share(self):
+        self.node.rejected_senders = {PublicKey.from_passphrase(WALLETS[1].mnemonic)}
+        results = transaction.transfer_sharded(self.payments, MEMO, WALLETS)
+        self.assertEqual(self.count_by_sender(results, True), {self.addresses[0]: 2, self.addresses[2]: 1})
+        self.assertEqual(self.count_by_sender(results, False), {self.addresses[1]: 2})
+        for result in results:
+            if not result.accepted:
+                self.assertIn("Cannot apply a transaction with nonce", result.error_message)
+
+
+if __name__ == "__main__":
+    unittest.main()
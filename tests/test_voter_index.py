@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+
+import data
+import voter_index
+from benchmarks.synthetic import make_voter_entries
+from support import use_temporary_data, start_stub_node, use_endpoints
+
+USERNAME = "stub"
+VOTER_COUNT = 500
+
+
+class VoterIndexTest(unittest.TestCase):
+    def setUp(self):
+        use_temporary_data(self)
+        self.node = start_stub_node(self, USERNAME, make_voter_entries(VOTER_COUNT, USERNAME))
+        use_endpoints(self, [self.node.base_url])
+        patcher = mock.patch.object(voter_index, "VOTER_SNAPSHOT_ENABLED", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_sync_is_full(self):
+        index = voter_index.sync_voter_index(USERNAME, 100, False, True)
+        self.assertEqual(len(index), VOTER_COUNT)
+        self.assertEqual(data.get_last_sync_height(USERNAME), 100)
+        self.assertEqual(data.get_last_full_sync_height(USERNAME), 100)
+        self.assertGreater(data.get_last_full_sync_timestamp(USERNAME), 0)
+
+    def test_incremental_sync_keeps_the_full_sync_height(self):
+        voter_index.sync_voter_index(USERNAME, 100, False, True)
+        voter_request_count = len(self.node.voter_requests)
+        for height in range(110, 200, 10):
+            voter_index.sync_voter_index(USERNAME, height, False, True)
+        self.assertEqual(len(self.node.voter_requests), voter_request_count)
+        self.assertEqual(data.get_last_sync_height(USERNAME), 190)
+        self.assertEqual(data.get_last_full_sync_height(USERNAME), 100)
+
+    def test_incremental_sync_applies_chain_activity(self):
+        voter_index.sync_voter_index(USERNAME, 100, False, True)
+        voter_request_count = len(self.node.voter_requests)
+        voters = self.node.voters
+        changed = voters[0]
+        changed["votingFor"][USERNAME]["votes"] = "123"
+        unvoted = voters.pop(1)
+        added = make_voter_entries(VOTER_COUNT + 1, USERNAME)[-1]
+        voters.append(added)
+        self.node.transactions = [
+            {"sender": "S-other", "recipient": changed["address"], "asset": None},
+            {"sender": unvoted["address"], "asset": {"votes": {}}},
+            {"sender": added["address"], "asset": {"votes": {USERNAME: 100.0}}},
+        ]
+        index = voter_index.sync_voter_index(USERNAME, 110, False, True)
+        self.assertEqual(len(self.node.voter_requests), voter_request_count)
+        self.assertEqual(index, {voter["address"]: int(voter["votingFor"][USERNAME]["votes"]) for voter in voters})
+        self.assertEqual(data.get_voter_index(USERNAME), index)
+
+    def test_full_sync_rebuilds_the_index(self):
+        voter_index.sync_voter_index(USERNAME, 100, False, True)
+        voter_request_count = len(self.node.voter_requests)
+        voter_index.sync_voter_index(USERNAME, 110, True, True)
+        self.assertGreater(len(self.node.voter_requests), voter_request_count)
+        self.assertEqual(data.get_last_full_sync_height(USERNAME), 110)
+
+    def test_index_without_full_sync_is_rebuilt(self):
+        # an index stored before full syncs were recorded has a sync height only
+        data.set_voter_index(USERNAME, {}, 100)
+        index = voter_index.sync_voter_index(USERNAME, 110, False, True)
+        self.assertEqual(len(index), VOTER_COUNT)
+        self.assertEqual(data.get_last_full_sync_height(USERNAME), 110)
+
+
+if __name__ == "__main__":
+    unittest.main()
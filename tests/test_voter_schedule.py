@@ -0,0 +1,69 @@
+import io
+import unittest
+from array import array
+from unittest import mock
+
+import data
+import messenger
+from config import MESSAGE_INTERVAL_SECONDS, ACTIVATION_ARCHIVE_SECONDS
+from producers import Producer, SenderWallet
+from selection import VoterColumns
+from support import use_temporary_data
+
+USERNAME = "stub"
+START = 1_700_000_000
+
+
+def get_schedule() -> {str: int}:
+    return dict(data.get_connection().execute(
+        "SELECT address, due FROM voter_schedule WHERE producer = ?", (USERNAME,)
+    ).fetchall())
+
+
+class VoterScheduleTest(unittest.TestCase):
+    def setUp(self):
+        use_temporary_data(self)
+        self.producer = Producer(USERNAME, [SenderWallet("mnemonic", None)], 0, "message", set())
+        patcher = mock.patch.object(messenger, "VOTER_SCHEDULE_ENABLED", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_at(self, timestamp: int, addresses: [str]) -> [str]:
+        voters = VoterColumns(addresses, array("q", [1] * len(addresses)))
+        with mock.patch.object(messenger, "now", timestamp), mock.patch("sys.stdout", io.StringIO()):
+            return messenger.get_due_voters_to_message(self.producer, False, False, voters, True).addresses
+
+    def test_voters_under_the_cap_lose_their_due_time(self):
+        self.assertEqual(self.run_at(START, ["a", "b"]), ["a", "b"])
+        self.assertEqual(set(get_schedule()), {"a", "b"})
+        # b dropped under the vote cap by the time both are due again
+        self.assertEqual(self.run_at(START + MESSAGE_INTERVAL_SECONDS, ["a"]), ["a"])
+        self.assertEqual(get_schedule(), {"a": START + 2 * MESSAGE_INTERVAL_SECONDS})
+        self.assertEqual(data.get_archived_activations(USERNAME, ["b"]), {"b": 1})
+
+    def test_voters_back_over_the_cap_keep_their_due_time(self):
+        self.assertEqual(self.run_at(START, ["a"]), ["a"])
+        # the votes of a move under and back over the vote cap every quarter of an hour
+        for quarter in range(1, 5):
+            addresses = ["a"] if quarter % 2 == 0 else []
+            self.assertEqual(self.run_at(START + quarter * 15 * 60, addresses), [])
+        self.assertEqual(data.get_activations(USERNAME), {"a": 1})
+        self.assertEqual(get_schedule(), {"a": START + MESSAGE_INTERVAL_SECONDS})
+        # under the cap when the due time passes, a is messaged as soon as it is back over it
+        self.run_at(START + MESSAGE_INTERVAL_SECONDS, [])
+        self.assertEqual(self.run_at(START + MESSAGE_INTERVAL_SECONDS + 15 * 60, ["a"]), ["a"])
+        self.assertEqual(data.get_activations(USERNAME), {"a": 2})
+
+    def test_evicted_voters_lose_their_due_time(self):
+        self.run_at(START, ["a", "b"])
+        self.run_at(START + MESSAGE_INTERVAL_SECONDS, ["a"])
+        # a due time left over for an archived voter
+        data.set_voter_dues(USERNAME, {"b": START + 2 * MESSAGE_INTERVAL_SECONDS})
+        timestamp = START + MESSAGE_INTERVAL_SECONDS + ACTIVATION_ARCHIVE_SECONDS + 1
+        self.run_at(timestamp, ["a"])
+        self.assertEqual(set(get_schedule()), {"a"})
+        self.assertEqual(data.get_archived_activations(USERNAME, ["b"]), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
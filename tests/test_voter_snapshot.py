@@ -0,0 +1,67 @@
+import unittest
+
+import data
+import metrics
+import voter_snapshot
+from benchmarks.synthetic import make_voter_entries
+from config import API_PAGE_LIMIT
+from support import use_temporary_data, start_stub_node, use_endpoints
+
+USERNAME = "stub"
+VOTER_COUNT = 500
+
+
+class VoterSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        use_temporary_data(self)
+        self.node = start_stub_node(self, USERNAME, make_voter_entries(VOTER_COUNT, USERNAME))
+        use_endpoints(self, [self.node.base_url])
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def get_votes(self) -> {str: int}:
+        return {voter["address"]: int(voter["votingFor"][USERNAME]["votes"]) for voter in self.node.voters}
+
+    def change_votes(self, position: int, votes: int):
+        self.node.voters[position]["votingFor"][USERNAME]["votes"] = str(votes)
+
+    def test_reused_at_the_same_height(self):
+        voter_snapshot.get_voter_snapshot(USERNAME, 100, True)
+        voter_request_count = len(self.node.voter_requests)
+        voters, is_complete = voter_snapshot.get_voter_snapshot(USERNAME, 100, True)
+        self.assertTrue(is_complete)
+        self.assertEqual(voters, self.get_votes())
+        self.assertEqual(len(self.node.voter_requests), voter_request_count)
+        self.assertEqual(metrics.get_counters()["voter_snapshots_reused"], 1)
+
+    def test_unchanged_pages_are_not_decoded_again(self):
+        page_count = VOTER_COUNT // API_PAGE_LIMIT
+        for height, etags, counter in [(100, True, "pages_not_modified"), (200, False, "pages_unchanged")]:
+            with self.subTest(etags=etags):
+                self.node.etags = etags
+                voter_snapshot.get_voter_snapshot(USERNAME, height, True)
+                metrics.reset()
+                self.change_votes(API_PAGE_LIMIT + 1, height)
+                voters, is_complete = voter_snapshot.get_voter_snapshot(USERNAME, height + 1, True)
+                self.assertTrue(is_complete)
+                self.assertEqual(voters, self.get_votes())
+                self.assertEqual(metrics.get_counters()[counter], page_count - 1)
+                self.assertEqual(metrics.get_phases()["page_decode"]["count"], 1)
+                # the stored snapshot has the changed page
+                self.assertEqual(voter_snapshot.merge_pages(data.get_voter_pages(USERNAME)), self.get_votes())
+
+    def test_pages_past_the_page_count_are_deleted(self):
+        voter_snapshot.get_voter_snapshot(USERNAME, 100, True)
+        self.assertEqual(len(data.get_voter_pages(USERNAME)), VOTER_COUNT // API_PAGE_LIMIT)
+        # the electorate shrinks to half its size
+        del self.node.voters[VOTER_COUNT // 2:]
+        voters, is_complete = voter_snapshot.get_voter_snapshot(USERNAME, 101, True)
+        self.assertTrue(is_complete)
+        self.assertEqual(voters, self.get_votes())
+        page_count = -(-(VOTER_COUNT // 2) // API_PAGE_LIMIT)
+        self.assertEqual(sorted(data.get_voter_pages(USERNAME)), list(range(1, page_count + 1)))
+        self.assertEqual(data.get_voter_snapshot_height(USERNAME), 101)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,7 @@
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from functools import partial, lru_cache
 from typing import Optional, Dict
 
 from solar_client import SolarClient
@@ -7,7 +10,14 @@ from solar_crypto.configuration.network import set_custom_network
 from solar_crypto.identity.address import address_from_passphrase
 from solar_crypto.transactions.builder.transfer import Transfer
 
-from config import TRANSACTION_NETWORK, API_BASE_URL
+from config import TRANSACTION_NETWORK, TRANSFER_MAX_RECIPIENTS, TRANSFER_RETRIES, BROADCAST_MAX_TRANSACTIONS, \
+    SIGNING_WORKERS, NODE_CONFIGURATION_CACHE_SECONDS, API_BROADCAST_ENDPOINTS
+from core_api import endpoint_pool, get_wallets
+from data import get_last_nonce, set_last_nonce, get_cached, set_cached, delete_cached
+from metrics import timed
+from producers import SenderWallet
+
+DEFAULT_TRANSFER_MAX_RECIPIENTS = 64
 
 
 class Payment(object):
@@ -16,6 +26,64 @@ class Payment(object):
         self.amount: int = amount
 
 
+class ChunkResult(object):
+    # nonce and transaction id are None for payments of a wallet that failed before signing
+    def __init__(
+            self,
+            payments: [Payment],
+            sender: str,
+            nonce: Optional[int],
+            transaction_id: Optional[str],
+            accepted: bool,
+            error_message: str
+    ):
+        self.payments: [Payment] = payments
+        self.sender: str = sender
+        self.nonce: Optional[int] = nonce
+        self.transaction_id: Optional[str] = transaction_id
+        self.accepted: bool = accepted
+        self.error_message: str = error_message
+
+
+class PreparedTransfer(object):
+    def __init__(self, payments: [Payment], memo: Optional[str], fee: int, nonce: int):
+        self.payments: [Payment] = payments
+        self.memo: Optional[str] = memo
+        self.fee: int = fee
+        self.nonce: int = nonce
+
+
+class NonceManager(object):
+    # hands out consecutive nonces locally, the api is only asked on startup and after a rejection
+    def __init__(self, sig: str):
+        self.address: str = get_wallet_address(sig)
+        self.last_nonce: Optional[int] = None
+        self.last_accepted_nonce: int = 0
+        self.is_rejected: bool = False
+
+    def sync(self):
+        if self.last_nonce is None:
+            # the stored nonce covers our own transactions that are not confirmed yet, after a rejection it may
+            # belong to transactions the pool dropped and only nonces accepted by this process are trusted
+            stored_nonce = self.last_accepted_nonce if self.is_rejected else get_last_nonce(self.address)
+            self.last_nonce = max(get_nonce(self.address), stored_nonce)
+
+    def next_nonce(self) -> int:
+        self.sync()
+        self.last_nonce += 1
+        return self.last_nonce
+
+    def accept(self, nonce: int):
+        if nonce > self.last_accepted_nonce:
+            self.last_accepted_nonce = nonce
+            set_last_nonce(self.address, nonce)
+
+    def reject(self):
+        # the nonce is looked up again when the next one is handed out
+        self.last_nonce = None
+        self.is_rejected = True
+
+
 def build_network():
     e = TRANSACTION_NETWORK["epoch"].split(",")
     version = TRANSACTION_NETWORK["version"]
@@ -25,21 +93,81 @@ def build_network():
     set_custom_network(epoch, version, wif)
 
 
-client = SolarClient(API_BASE_URL)
-build_network()
+clients: Dict[str, SolarClient] = {}
+is_network_built = False
+
+NODE_CONFIGURATION_CACHE_KEY = "node_configuration"
+WALLET_ADDRESS_CACHE_SECONDS = 30 * 24 * 60 * 60
 
-cached_dynamic_fees_config: Optional[Dict] = None
+nonce_managers: Dict[str, NonceManager] = {}
 
 
 def get_nonce(address: str) -> int:
     try:
-        n = client.wallets.get(address)
+        n = get_client().wallets.get(address)
     except SolarHTTPException as e:
         raise Exception(e, "failure while getting nonce")
 
     return int(n["data"]["nonce"])
 
 
+def get_client(base_url: Optional[str] = None) -> SolarClient:
+    # without a base url the client of the fastest available api is returned
+    if base_url is None:
+        base_url = endpoint_pool.ranked()[0].base_url
+    if base_url not in clients:
+        clients[base_url] = SolarClient(base_url)
+    return clients[base_url]
+
+
+def create_transactions(batch: [Dict]) -> Dict:
+    # broadcasts to several apis at once, a transaction counts as accepted when any of them accepted it
+    endpoints = endpoint_pool.ranked()[:API_BROADCAST_ENDPOINTS]
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        futures = [executor.submit(get_client(endpoint.base_url).transactions.create, batch) for endpoint in endpoints]
+    responses = []
+    last_error: Optional[Exception] = None
+    for endpoint, future in zip(endpoints, futures):
+        if future.exception() is None:
+            responses.append(future.result())
+        else:
+            endpoint_pool.record_failure(endpoint)
+            last_error = future.exception()
+    if not responses:
+        raise last_error
+    accepted = set().union(*(response["data"]["accept"] for response in responses))
+    errors: Dict[str, Dict] = {}
+    for response in responses:
+        if "errors" in response:
+            errors.update(
+                (transaction_id, error) for transaction_id, error in response["errors"].items()
+                if transaction_id not in accepted and transaction_id not in errors
+            )
+    return {"data": {"accept": list(accepted)}, "errors": errors}
+
+
+def ensure_network():
+    global is_network_built
+    if not is_network_built:
+        build_network()
+        is_network_built = True
+
+
+def get_nonce_manager(sig: str) -> NonceManager:
+    if sig not in nonce_managers:
+        nonce_managers[sig] = NonceManager(sig)
+    return nonce_managers[sig]
+
+
+def prepare_transfers(sigs: [str]):
+    # everything a transfer needs from the api and the crypto setup, done ahead while voters are still fetched
+    ensure_network()
+    get_transfer_max_recipients()
+    get_cached_dynamic_fees_config()
+    for sig in sigs:
+        get_nonce_manager(sig).sync()
+
+
 def build_transfer_transaction(
         payments: [Payment],
         memo: Optional[str],
@@ -50,6 +178,7 @@ def build_transfer_transaction(
 ) -> Transfer:
     if fee <= 0:
         raise Exception("fee is too low")
+    ensure_network()
 
     transaction = Transfer(
         memo=memo,
@@ -73,27 +202,103 @@ def build_transfer_transaction(
     return transaction
 
 
-def broadcast(tx: Transfer) -> (bool, str):
-    try:
-        transaction = client.transactions.create([tx.to_dict()])
-    except SolarHTTPException as e:
-        raise Exception(e, "failure while broadcasting transaction")
-    success = len(transaction["data"]["accept"]) != 0
-    error = next(iter(transaction["errors"].values()), None) if "errors" in transaction else None
-    error_message = "" if error is None else error["message"]
-    return success, error_message
+def sign_prepared_transfer(prepared: PreparedTransfer, sig: str, second_sig: Optional[str]) -> Dict:
+    return build_transfer_transaction(
+        prepared.payments, prepared.memo, prepared.fee, sig, second_sig, prepared.nonce
+    ).to_dict()
 
 
-def get_cached_dynamic_fees_config() -> Dict:
-    global cached_dynamic_fees_config
-    if cached_dynamic_fees_config is None:
+def sign_prepared_transfers(
+        prepared_transfers: [PreparedTransfer],
+        sig: str,
+        second_sig: Optional[str],
+        workers: int = SIGNING_WORKERS
+) -> [Dict]:
+    # signed transactions are returned in the order of the prepared transfers, which keeps nonces ordered
+    sign = partial(sign_prepared_transfer, sig=sig, second_sig=second_sig)
+    if workers <= 1 or len(prepared_transfers) <= 1:
+        return list(map(sign, prepared_transfers))
+    with ProcessPoolExecutor(max_workers=min(workers, len(prepared_transfers)), initializer=ensure_network) as executor:
+        return list(executor.map(sign, prepared_transfers))
+
+
+def broadcast_many(transactions: [Dict], nonce_manager: NonceManager) -> Dict[str, Optional[str]]:
+    # returns an error message per transaction id, None for accepted transactions
+    # accepted nonces are recorded per batch, a failing batch fails its own transactions and those after it,
+    # whose nonces would follow nonces the node may not have
+    results: Dict[str, Optional[str]] = {}
+    failure_message: Optional[str] = None
+    for offset in range(0, len(transactions), BROADCAST_MAX_TRANSACTIONS):
+        batch = transactions[offset:offset + BROADCAST_MAX_TRANSACTIONS]
+        if failure_message is not None:
+            results.update((tx["id"], f"not broadcast after an earlier failure: {failure_message}") for tx in batch)
+            continue
         try:
-            cached_dynamic_fees_config = client.node.configuration()["data"]["pool"]["dynamicFees"]
+            response = create_transactions(batch)
         except Exception as e:
-            raise Exception(e, "failure while getting dynamic fees config")
-    return cached_dynamic_fees_config
+            failure_message = f"failure while broadcasting transactions: {e}"
+            results.update((tx["id"], failure_message) for tx in batch)
+            continue
+        accepted = set(response["data"]["accept"])
+        errors = response["errors"] if "errors" in response else {}
+        for tx in batch:
+            transaction_id = tx["id"]
+            if transaction_id in accepted:
+                results[transaction_id] = None
+                nonce_manager.accept(int(tx["nonce"]))
+            else:
+                results[transaction_id] = errors[transaction_id]["message"] if transaction_id in errors else "rejected"
+    return results
 
 
+def get_wallet_address(sig: str) -> str:
+    # keyed on a hash, the mnemonic itself is never stored
+    key = "wallet_address:" + hashlib.sha256(sig.encode()).hexdigest()
+    address = get_cached(key)
+    if address is None:
+        address = address_from_passphrase(sig)
+        set_cached(key, address, WALLET_ADDRESS_CACHE_SECONDS)
+    return address
+
+
+def get_cached_node_configuration() -> Dict:
+    node_configuration = get_cached(NODE_CONFIGURATION_CACHE_KEY)
+    if node_configuration is None:
+        try:
+            node_configuration = get_client().node.configuration()["data"]
+        except Exception as e:
+            raise Exception(e, "failure while getting node configuration")
+        set_cached(NODE_CONFIGURATION_CACHE_KEY, node_configuration, NODE_CONFIGURATION_CACHE_SECONDS)
+        # fees memoized for an expired configuration may be outdated
+        get_dynamic_fee.cache_clear()
+    return node_configuration
+
+
+def invalidate_cached_node_configuration():
+    delete_cached(NODE_CONFIGURATION_CACHE_KEY)
+    get_dynamic_fee.cache_clear()
+
+
+def get_cached_dynamic_fees_config() -> Dict:
+    try:
+        return get_cached_node_configuration()["pool"]["dynamicFees"]
+    except KeyError as e:
+        raise Exception(e, "failure while getting dynamic fees config")
+
+
+def get_transfer_max_recipients() -> int:
+    if TRANSFER_MAX_RECIPIENTS is not None:
+        return TRANSFER_MAX_RECIPIENTS
+    node_configuration = get_cached_node_configuration()
+    constants = node_configuration["constants"] if "constants" in node_configuration else {}
+    if "transfer" in constants and "maximum" in constants["transfer"]:
+        return int(constants["transfer"]["maximum"])
+    if "multiPaymentLimit" in constants:
+        return int(constants["multiPaymentLimit"])
+    return DEFAULT_TRANSFER_MAX_RECIPIENTS
+
+
+@lru_cache(maxsize=None)
 def get_dynamic_fee(payment_count: int, memo: Optional[str], is_second_sig_present: bool) -> int:
     dynamic_fees_config = get_cached_dynamic_fees_config()
     transfer_addon_bytes = dynamic_fees_config["addonBytes"]["transfer"]
@@ -106,19 +311,96 @@ def get_dynamic_fee(payment_count: int, memo: Optional[str], is_second_sig_prese
     return int((transfer_addon_bytes + (round(tx_bytes / 2) + 1)) * fee_multiplier)
 
 
-def transfer(
-        payments: [Payment],
+def chunk_payments(payments: [Payment], max_recipients: int) -> [[Payment]]:
+    return [payments[offset:offset + max_recipients] for offset in range(0, len(payments), max_recipients)]
+
+
+def transfer_batch(
+        chunks: [[Payment]],
         memo: Optional[str],
-        fee: Optional[int],
         sig: str,
-        second_sig: Optional[str],
-        nonce: Optional[int]
-):
-    if fee is None:
-        fee = get_dynamic_fee(len(payments), memo, second_sig is not None)
-    if nonce is None:
-        nonce = get_nonce(address_from_passphrase(sig)) + 1
-    tx = build_transfer_transaction(payments, memo, fee, sig, second_sig, nonce)
-    success, error_message = broadcast(tx)
-    if not success:
-        raise Exception(error_message)
+        second_sig: Optional[str]
+) -> [ChunkResult]:
+    # sends the chunks with consecutive nonces, rejected chunks are retried with the nonces following the last
+    # accepted nonce, accepted chunks are never sent twice and stay accepted when a later step fails
+    address = get_wallet_address(sig)
+    pending = chunks
+    results: [ChunkResult] = []
+    for attempt in range(TRANSFER_RETRIES + 1):
+        try:
+            nonce_manager = get_nonce_manager(sig)
+            prepared_transfers = []
+            for chunk in pending:
+                with timed("fee"):
+                    fee = get_dynamic_fee(len(chunk), memo, second_sig is not None)
+                prepared_transfers.append(PreparedTransfer(chunk, memo, fee, nonce_manager.next_nonce()))
+            with timed("signing"):
+                transactions = sign_prepared_transfers(prepared_transfers, sig, second_sig)
+        except Exception as e:
+            # nothing of the pending chunks was broadcast
+            return results + [ChunkResult(chunk, address, None, None, False, str(e)) for chunk in pending]
+        with timed("broadcast"):
+            errors = broadcast_many(transactions, nonce_manager)
+        rejected: [ChunkResult] = []
+        for chunk, tx in zip(pending, transactions):
+            error_message = errors[tx["id"]]
+            if error_message is None:
+                results.append(ChunkResult(chunk, address, int(tx["nonce"]), tx["id"], True, ""))
+            else:
+                rejected.append(ChunkResult(chunk, address, int(tx["nonce"]), tx["id"], False, error_message))
+        if rejected:
+            nonce_manager.reject()
+            invalidate_cached_node_configuration()
+        if not rejected or attempt == TRANSFER_RETRIES:
+            return results + rejected
+        pending = [chunk_result.payments for chunk_result in rejected]
+    return results
+
+
+def get_transfer_cost(payments: [Payment], memo: Optional[str], wallet: SenderWallet) -> int:
+    return get_dynamic_fee(len(payments), memo, wallet.second_mnemonic is not None) + sum(
+        payment.amount for payment in payments
+    )
+
+
+def assign_chunks(
+        chunks: [[Payment]],
+        memo: Optional[str],
+        wallets: [SenderWallet],
+        balances: [int]
+) -> [[[Payment]]]:
+    # the chunks go round robin to the wallets that can still pay for them, returns the chunks per wallet
+    remaining_balances = list(balances)
+    shares: [[[Payment]]] = [[] for _ in wallets]
+    index = 0
+    for chunk in chunks:
+        for offset in range(len(wallets)):
+            candidate = (index + offset) % len(wallets)
+            cost = get_transfer_cost(chunk, memo, wallets[candidate])
+            if cost <= remaining_balances[candidate]:
+                break
+        else:
+            raise Exception(f"insufficient balance in the sender wallets for {len(chunks)} transaction(s)")
+        remaining_balances[candidate] -= cost
+        shares[candidate].append(chunk)
+        index = candidate + 1
+    return shares
+
+
+def transfer_sharded(payments: [Payment], memo: Optional[str], wallets: [SenderWallet]) -> [ChunkResult]:
+    # every wallet sends its share of the payments with its own nonces, the wallets broadcast at the same time
+    # so a pool of wallets gets more transactions into a block and a stuck nonce only holds up one share
+    # reading the fees config fetches a new node configuration once the cached one expired
+    get_cached_dynamic_fees_config()
+    chunks = chunk_payments(payments, get_transfer_max_recipients())
+    addresses = [get_wallet_address(wallet.mnemonic) for wallet in wallets]
+    with timed("balance"):
+        sender_wallets = get_wallets(addresses)
+    balances = [0 if sender_wallets[address] is None else sender_wallets[address].balance for address in addresses]
+    shares = assign_chunks(chunks, memo, wallets, balances)
+    with ThreadPoolExecutor(max_workers=len(wallets)) as executor:
+        futures = [
+            executor.submit(transfer_batch, share, memo, wallet.mnemonic, wallet.second_mnemonic)
+            for wallet, share in zip(wallets, shares) if share
+        ]
+    return [chunk_result for future in futures for chunk_result in future.result()]
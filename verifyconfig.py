@@ -1,40 +1,89 @@
-from config import API_BASE_URL, SYNC_CHECK_BLOCK_THRESHOLD, BLOCK_PRODUCER_USERNAME, WALLET_MNEMONIC, \
-    WALLET_SECOND_MNEMONIC, VOTE_CAP, MESSAGE, MESSAGE_INTERVAL_SECONDS, MESSAGE_LIMIT_PER_VOTER
+from config import API_BASE_URLS, API_HEDGE_AFTER_SECONDS, API_BROADCAST_ENDPOINTS, API_TIMEOUT_SECONDS, \
+    API_PAGE_LIMIT, API_MAX_WORKERS, SYNC_CHECK_BLOCK_THRESHOLD, MESSAGE_INTERVAL_SECONDS, MESSAGE_LIMIT_PER_VOTER
+from producers import producers
 
 
 def verify_values():
-    if API_BASE_URL == "" or API_BASE_URL is None:
+    if not API_BASE_URLS:
         raise Exception(
-            "Invalid API_BASE_URL, valid example: \"http://localhost:<port>/api\""
+            "Invalid API_BASE_URLS, add at least one api url"
         )
-    if not API_BASE_URL.endswith("/api"):
+    for base_url in API_BASE_URLS:
+        if base_url == "" or base_url is None:
+            raise Exception(
+                "Invalid API_BASE_URL, valid example: \"http://localhost:<port>/api\""
+            )
+        if not base_url.endswith("/api"):
+            raise Exception(
+                f"Invalid API_BASE_URL {base_url}, needs to end in '/api'"
+            )
+    if API_HEDGE_AFTER_SECONDS is not None and API_HEDGE_AFTER_SECONDS <= 0:
         raise Exception(
-            "Invalid API_BASE_URL, needs to end in '/api'"
+            "Invalid API_HEDGE_AFTER_SECONDS, too low, use None to disable hedging"
         )
-    if SYNC_CHECK_BLOCK_THRESHOLD < 1:
+    if API_BROADCAST_ENDPOINTS < 1:
         raise Exception(
-            "Invalid SYNC_CHECK_BLOCK_THRESHOLD, too low"
+            "Invalid API_BROADCAST_ENDPOINTS, too low"
+        )
+    if API_TIMEOUT_SECONDS <= 0:
+        raise Exception(
+            "Invalid API_TIMEOUT_SECONDS, too low"
         )
-    if BLOCK_PRODUCER_USERNAME == "" or BLOCK_PRODUCER_USERNAME is None:
+    if API_PAGE_LIMIT < 1 or API_PAGE_LIMIT > 100:
         raise Exception(
-            "Invalid BLOCK_PRODUCER_USERNAME, may not be empty or None"
+            "Invalid API_PAGE_LIMIT, use a value from 1 to 100"
         )
-    if WALLET_MNEMONIC == "" or WALLET_MNEMONIC is None:
+    if API_MAX_WORKERS < 1:
         raise Exception(
-            "Invalid WALLET_MNEMONIC, may not be empty or None"
+            "Invalid API_MAX_WORKERS, too low"
         )
-    if WALLET_SECOND_MNEMONIC == "":
+    if SYNC_CHECK_BLOCK_THRESHOLD < 1:
         raise Exception(
-            "Invalid WALLET_SECOND_MNEMONIC, use None instead of empty str"
+            "Invalid SYNC_CHECK_BLOCK_THRESHOLD, too low"
         )
-    if VOTE_CAP < 1:
+    if len(producers) == 0:
         raise Exception(
-            "Invalid VOTE_CAP, too low"
+            "Invalid PRODUCERS, add at least one block producer"
         )
-    if MESSAGE == "" or MESSAGE is None:
+    if len({producer.username for producer in producers}) != len(producers):
         raise Exception(
-            "Invalid MESSAGE, may not be empty or None"
+            "Invalid PRODUCERS, a block producer username may only be used once"
         )
+    for producer in producers:
+        if producer.username == "" or producer.username is None:
+            raise Exception(
+                "Invalid BLOCK_PRODUCER_USERNAME, may not be empty or None"
+            )
+        main_wallet, *sender_wallets = producer.wallets
+        if main_wallet.mnemonic == "" or main_wallet.mnemonic is None:
+            raise Exception(
+                f"Invalid WALLET_MNEMONIC for {producer.username}, may not be empty or None"
+            )
+        if main_wallet.second_mnemonic == "":
+            raise Exception(
+                f"Invalid WALLET_SECOND_MNEMONIC for {producer.username}, use None instead of empty str"
+            )
+        for wallet in sender_wallets:
+            if wallet.mnemonic == "" or wallet.mnemonic is None:
+                raise Exception(
+                    f"Invalid SENDER_WALLETS for {producer.username}, a mnemonic may not be empty or None"
+                )
+            if wallet.second_mnemonic == "":
+                raise Exception(
+                    f"Invalid SENDER_WALLETS for {producer.username}, use None instead of empty str"
+                )
+        if len({wallet.mnemonic for wallet in producer.wallets}) != len(producer.wallets):
+            raise Exception(
+                f"Invalid SENDER_WALLETS for {producer.username}, a wallet may only be used once"
+            )
+        if producer.vote_cap < 1:
+            raise Exception(
+                f"Invalid VOTE_CAP for {producer.username}, too low"
+            )
+        if producer.message == "" or producer.message is None:
+            raise Exception(
+                f"Invalid MESSAGE for {producer.username}, may not be empty or None"
+            )
     if MESSAGE_INTERVAL_SECONDS < 3600:
         raise Exception(
             "Invalid MESSAGE_INTERVAL_SECONDS, 3600s (1h) is the smallest allowed interval"
@@ -0,0 +1,77 @@
+from time import time
+from typing import Dict, Set, Optional
+
+from api import Pagination
+from config import API_PAGE_LIMIT, INCREMENTAL_SYNC_MAX_BLOCKS, VOTER_SNAPSHOT_ENABLED
+from core_api import get_voters, get_transactions, get_wallets, get_node_status
+from data import get_last_sync_height, get_last_full_sync_height, get_voter_index, set_voter_index, \
+    set_last_full_sync
+from voter_snapshot import get_voter_snapshot
+
+
+def is_voter_index_stale(last_full_sync_height: int, last_sync_height: int, height: int) -> bool:
+    # an index without a full sync is never trusted, a long gap since the last sync is rebuilt instead of replayed
+    return last_full_sync_height <= 0 or height < last_sync_height \
+        or height - last_sync_height > INCREMENTAL_SYNC_MAX_BLOCKS
+
+
+def build_voter_index(username: str, height: int, persist: bool) -> Dict[str, int]:
+    if VOTER_SNAPSHOT_ENABLED:
+        voter_index, is_complete = get_voter_snapshot(username, height, persist)
+    else:
+        pagination = Pagination(f"/delegates/{username}/voters", API_PAGE_LIMIT)
+        voter_index = {voter.address: voter.votes for voter in get_voters(username, pagination=pagination)}
+        is_complete = pagination.complete
+    if not is_complete:
+        raise Exception(f"Incomplete voter list for username {username}")
+    return voter_index
+
+
+def get_changed_addresses(voter_index: Dict[str, int], height_from: int, height_to: int) -> Set[str]:
+    # votes of a voter only change through its own votes or through transactions that change its balance
+    pagination = Pagination(
+        "/transactions",
+        API_PAGE_LIMIT,
+        params={"height.from": height_from, "height.to": height_to}
+    )
+    changed_addresses: Set[str] = set()
+    for transaction in get_transactions(height_from, height_to, pagination):
+        if transaction.sender is not None and (transaction.is_vote or transaction.sender in voter_index):
+            changed_addresses.add(transaction.sender)
+        changed_addresses.update(recipient for recipient in transaction.recipients if recipient in voter_index)
+    if not pagination.complete:
+        raise Exception(f"Incomplete transaction list for heights {height_from} - {height_to}")
+    return changed_addresses
+
+
+def update_voter_index(username: str, voter_index: Dict[str, int], height_from: int, height_to: int) -> Dict[str, int]:
+    changed_addresses = get_changed_addresses(voter_index, height_from, height_to)
+    for address, wallet in get_wallets(list(changed_addresses), username).items():
+        votes = 0 if wallet is None else wallet.votes
+        if votes > 0:
+            voter_index[address] = votes
+        else:
+            voter_index.pop(address, None)
+    return voter_index
+
+
+def sync_voter_index(username: str, height: Optional[int], is_full_sync: bool, persist: bool) -> Dict[str, int]:
+    # a full sync reads every voter, in between only the activity since the last synced height is applied
+    if height is None:
+        height = get_node_status().now
+    last_sync_height = get_last_sync_height(username)
+    voter_index = None
+    if not is_full_sync and not is_voter_index_stale(get_last_full_sync_height(username), last_sync_height, height):
+        voter_index = get_voter_index(username)
+        if height > last_sync_height:
+            try:
+                voter_index = update_voter_index(username, voter_index, last_sync_height + 1, height)
+            except Exception:
+                voter_index = None
+    if voter_index is None:
+        voter_index = build_voter_index(username, height, persist)
+        if persist:
+            set_last_full_sync(username, height, int(time()))
+    if persist:
+        set_voter_index(username, voter_index, height)
+    return voter_index
@@ -0,0 +1,37 @@
+from typing import Dict, Optional
+
+from api import Pagination, CachedPage
+from config import API_PAGE_LIMIT
+from core_api import get_cached_pages, get_node_status, parse_votes
+from data import get_voter_pages, get_voter_snapshot_height, set_voter_pages
+from metrics import increment
+
+
+def get_votes_by_address(username: str, data: list) -> Dict[str, int]:
+    return {entry["address"]: parse_votes(entry, username) for entry in data}
+
+
+def merge_pages(pages: Dict[int, CachedPage]) -> Dict[str, int]:
+    voters: Dict[str, int] = {}
+    for page in sorted(pages):
+        voters.update(pages[page].entries)
+    return voters
+
+
+def get_voter_snapshot(username: str, height: Optional[int], persist: bool) -> (Dict[str, int], bool):
+    # the votes of every voter, not read again while the chain stays at the same height and unchanged pages are
+    # not decoded again, also returns whether the voter list is complete
+    if height is None:
+        height = get_node_status().now
+    cached_pages = get_voter_pages(username)
+    if cached_pages and get_voter_snapshot_height(username) == height:
+        increment("voter_snapshots_reused")
+        return merge_pages(cached_pages), True
+    pagination = Pagination(f"/delegates/{username}/voters", API_PAGE_LIMIT)
+    pages = get_cached_pages(pagination, cached_pages, lambda data: get_votes_by_address(username, data))
+    if persist and pagination.complete:
+        changed_pages = {
+            page: cached_page for page, cached_page in pages.items() if cached_page is not cached_pages.get(page)
+        }
+        set_voter_pages(username, changed_pages, pagination.page_count, height)
+    return merge_pages(pages), pagination.complete